@@ -1,7 +1,7 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import CustomUserViewSet, CustomLoginView, UserAvatarViewSet
+from .views import CustomUserViewSet, CustomLoginView, UserAvatarViewSet, UserExportView
 
 # Roteador para ViewSet
 router = DefaultRouter()
@@ -12,6 +12,7 @@ urlpatterns = [
     # Login JWT
     path('login/', CustomLoginView.as_view(), name='login'),
     path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('users/export/', UserExportView.as_view(), name='users-export'),
 ]
 
 # Inclui rotas automáticas do ViewSet (ex: /users/)
@@ -10,6 +10,8 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView
 from django.shortcuts import get_object_or_404
 
+from wayne_backend.core.exports import StreamingExportView
+
 from .models import CustomUser, UserAvatar
 from .serializers import CustomUserSerializer, UserAvatarSerializer
 
@@ -147,3 +149,14 @@ class UserAvatarViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(avatar)
             return Response(serializer.data)
         return Response({"detail": "No avatar found."}, status=status.HTTP_404_NOT_FOUND)
+
+
+class UserExportView(StreamingExportView):
+    """Exporta os usuários (CSV ou NDJSON, em streaming), sem senha nem documentos."""
+    export_menu = 'users'
+    filename = 'users'
+    columns = [
+        'id', 'username', 'email', 'first_name', 'last_name', 'phone',
+        'is_active', 'is_staff', 'date_joined', 'last_login',
+    ]
+    queryset = CustomUser.objects.order_by('id').values(*columns)
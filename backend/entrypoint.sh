@@ -56,6 +56,10 @@ done
 log_info "Generating general migrations..."
 python3 manage.py makemigrations
 
+# Antes do migrate: a constraint uniq_order_user_code falha com códigos repetidos
+log_info "Renumbering duplicate order codes..."
+python3 manage.py dedupe_order_codes
+
 log_info "Applying migrations..."
 python3 manage.py migrate --noinput
 
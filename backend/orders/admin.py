@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem, OrderDelivery, OrderShipping
+from .models import Order, OrderItem, OrderDelivery, OrderShipping, NotificationOutbox
 
 
 class OrderItemInline(admin.TabularInline):
@@ -23,17 +23,6 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]
     ordering = ['-created_at']
 
-    def sub_total(self, obj):
-        return obj.sub_total
-    def discount(self, obj):
-        return obj.discount
-    def shippingFee(self, obj):
-        return obj.shippingFee
-    def tax(self, obj):
-        return obj.tax
-    def total(self, obj):
-        return obj.total
-
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -62,4 +51,13 @@ class OrderShippingAdmin(admin.ModelAdmin):
         (None, {
             'fields': ('order', 'address', 'canceled', 'created_at')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'order', 'kind', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['kind', 'status']
+    search_fields = ['idempotency_key', 'order__code']
+    readonly_fields = ['idempotency_key', 'created_at', 'sent_at', 'last_error']
+    ordering = ['-created_at']
@@ -1,7 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
     verbose_name = 'Order Management'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import ensure_order_search_table
+
+        post_migrate.connect(ensure_order_search_table, sender=self)
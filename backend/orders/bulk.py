@@ -0,0 +1,338 @@
+"""
+Escritas de pedidos em lote: vários pedidos em uma transação e itens gravados
+com bulk_create/bulk_update, sem passar pelo save() de cada linha.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import localtime, now
+
+from wayne_backend.core.cache import bump_version
+from .models import (
+    DASHBOARD_CACHE,
+    EVENT_FIELDS,
+    NotificationOutbox,
+    Order,
+    OrderCodeCounter,
+    OrderDailyStats,
+    OrderDelivery,
+    OrderItem,
+    OrderPayment,
+    OrderShipping,
+    ProductSalesDaily,
+    calculate_totals,
+    format_order_code,
+)
+from .inventory import apply_stock_changes, item_quantities, price_items, release_stock, reserve_stock
+from .search import schedule_reindex
+
+ITEM_FIELDS = ['product_id', 'quantity', 'price']
+
+
+def totals_from_items(items_data):
+    """Mesmo resultado de Order.refresh_totals(), calculado a partir dos dados recebidos."""
+    sub_total = sum((Decimal(item['quantity']) * item['price'] for item in items_data), Decimal('0'))
+    discountable = sum(
+        (Decimal(item['quantity']) * item['price'] for item in items_data if item['price'] > 500),
+        Decimal('0'),
+    )
+    return calculate_totals(sub_total, discountable)
+
+
+def bulk_create_orders(user, orders_data):
+    """
+    Cria os pedidos de `orders_data` (cada um com sua lista de `items` e,
+    opcionalmente, o `user` dono; sem ele, `user`) em uma única transação:
+    uma reserva de códigos por dono, um INSERT de pedidos, um INSERT de itens
+    e uma atualização por bucket do rollup.
+    Preços e estoque são resolvidos uma vez para todos os itens.
+    """
+    if not orders_data:
+        return []
+
+    all_items = [item for data in orders_data for item in data['items']]
+    price_items(all_items)
+    owners = [data.get('user', user) for data in orders_data]
+
+    with transaction.atomic():
+        reserve_stock(all_items)
+        # Códigos seguem a sequência de cada dono, na ordem dos pedidos enviados
+        per_owner = Counter(owner.pk for owner in owners)
+        codes = {pk: iter(OrderCodeCounter.reserve(pk, count)) for pk, count in per_owner.items()}
+        orders = [
+            Order(
+                user=owner, code=format_order_code(next(codes[owner.pk])), stock_reserved=True,
+                **totals_from_items(data['items']),
+            )
+            for owner, data in zip(owners, orders_data)
+        ]
+        orders = Order.objects.bulk_create(orders)
+
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=order, **{field: item[field] for field in ITEM_FIELDS})
+                for order, data in zip(orders, orders_data)
+                for item in data['items']
+            ],
+            batch_size=500,
+        )
+
+        buckets = defaultdict(list)
+        for order in orders:
+            local = localtime(order.created_at)
+            buckets[(local.date(), local.hour, order.status)].append(order)
+        for (_, _, status), bucket_orders in buckets.items():
+            OrderDailyStats.apply_delta(
+                bucket_orders[0].created_at,
+                status,
+                count=len(bucket_orders),
+                revenue=sum(order.total for order in bucket_orders),
+            )
+
+        bump_version(DASHBOARD_CACHE)
+        # bulk_create não dispara post_save
+        schedule_reindex([order.id for order in orders])
+
+    return orders
+
+
+def sync_order_items(order, items_data):
+    """
+    Aplica a lista de itens recebida sobre os itens existentes do pedido:
+    casa por id (ou, sem id, por product_id), atualiza só o que mudou,
+    insere os novos e remove os que sumiram. Recalcula os totais uma vez.
+    Os preços vêm do produto; com estoque reservado, só a diferença de
+    quantidade por produto é baixada ou devolvida.
+    """
+    price_items(items_data)
+    existing = {item.id: item for item in order.items.all()}
+    by_product = {}
+    for item in existing.values():
+        by_product.setdefault(item.product_id, []).append(item)
+
+    matched, to_create, to_update = set(), [], []
+
+    for data in items_data:
+        item = existing.get(data.get('id'))
+        if item is None or item.id in matched:
+            candidates = [c for c in by_product.get(data['product_id'], []) if c.id not in matched]
+            item = candidates[0] if candidates else None
+
+        if item is None:
+            to_create.append(OrderItem(order=order, **{field: data[field] for field in ITEM_FIELDS}))
+            continue
+
+        matched.add(item.id)
+        changed = False
+        for field in ITEM_FIELDS:
+            if getattr(item, field) != data[field]:
+                setattr(item, field, data[field])
+                changed = True
+        if changed:
+            to_update.append(item)
+
+    to_delete = [item_id for item_id in existing if item_id not in matched]
+
+    with transaction.atomic():
+        if order.stock_reserved:
+            before = item_quantities([{'product_id': i.product_id, 'quantity': i.quantity} for i in existing.values()])
+            after = item_quantities(items_data)
+            apply_stock_changes({pid: after[pid] - before[pid] for pid in before.keys() | after.keys()})
+        if to_delete:
+            OrderItem.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            OrderItem.objects.bulk_update(to_update, ITEM_FIELDS)
+        if to_create:
+            OrderItem.objects.bulk_create(to_create)
+        if to_delete or to_update or to_create:
+            order.refresh_totals()
+
+
+TRANSITION_CANCEL = 'cancel'
+TRANSITION_COMPLETE = 'complete'
+TRANSITION_SHIP = 'ship'
+TRANSITION_STATUS = {
+    TRANSITION_CANCEL: 'canceled',
+    TRANSITION_COMPLETE: 'completed',
+    TRANSITION_SHIP: 'shipped',
+}
+
+
+def _active(model):
+    return Exists(model.objects.filter(order_id=OuterRef('pk'), canceled=False))
+
+
+FINAL_STATUSES = ['completed', 'canceled']
+
+
+def _transition_rejection(action, row):
+    """Mesmas regras do Order.save(), aplicadas a uma linha já anotada."""
+    if action == TRANSITION_CANCEL:
+        if row['canceled_at'] is not None:
+            return "Order is already canceled."
+        return None
+
+    if row['status'] in FINAL_STATUSES:
+        return f"Order is already {row['status']}."
+
+    if action == TRANSITION_COMPLETE:
+        if not row['has_payment']:
+            return "Cannot complete order: missing valid payment."
+        if not row['has_delivery']:
+            return "Cannot complete order: missing valid delivery."
+        if not row['has_shipping']:
+            return "Cannot complete order: missing valid shipping."
+    if action == TRANSITION_SHIP and not row['has_shipping']:
+        return "Cannot ship order: missing valid shipping."
+    return None
+
+
+def _target_status(action, row):
+    # Despachado com transportadora é 'delivered', como em Order.derive_status()
+    if action == TRANSITION_SHIP and row['has_carrier']:
+        return 'delivered'
+    return TRANSITION_STATUS[action]
+
+
+def _claim_orders(order_ids, values, action):
+    """
+    UPDATE condicional ... RETURNING id: grava `values` só nos pedidos que
+    ainda estão no estado de partida da transição e devolve quais mudaram.
+    Um cancel e um complete simultâneos nunca passam os dois.
+    """
+    qn = connection.ops.quote_name
+    assignments, params = [], []
+    for name, value in values.items():
+        field = Order._meta.get_field(name)
+        assignments.append(f'{qn(field.column)} = %s')
+        params.append(field.get_db_prep_save(value, connection))
+
+    if action == TRANSITION_CANCEL:
+        condition, condition_params = f'{qn("canceled_at")} IS NULL', []
+    else:
+        condition, condition_params = f'{qn("status")} NOT IN (%s, %s)', FINAL_STATUSES
+
+    table, pk = qn(Order._meta.db_table), qn('id')
+    claimed = []
+    order_ids = list(order_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(order_ids), 500):
+            chunk = order_ids[start:start + 500]
+            cursor.execute(
+                f'UPDATE {table} SET {", ".join(assignments)} WHERE {condition} '
+                f'AND {pk} IN ({", ".join(["%s"] * len(chunk))}) RETURNING {pk}',
+                [*params, *condition_params, *chunk],
+            )
+            claimed.extend(row[0] for row in cursor.fetchall())
+    return claimed
+
+
+def _move_daily_stats(rows):
+    buckets = defaultdict(list)
+    for row in rows:
+        local = localtime(row['created_at'])
+        buckets[(local.date(), local.hour, row['status'], row['new_status'])].append(row)
+
+    for (_, _, old_status, new_status), bucket_rows in buckets.items():
+        count = len(bucket_rows)
+        revenue = sum(row['total'] for row in bucket_rows)
+        created_at = bucket_rows[0]['created_at']
+        OrderDailyStats.apply_delta(created_at, old_status, count=-count, revenue=-revenue)
+        OrderDailyStats.apply_delta(created_at, new_status, count=count, revenue=revenue)
+
+
+def bulk_transition(order_ids, action):
+    """
+    Aplica cancel/complete/ship a vários pedidos com UPDATEs em conjunto.
+    Devolve (ids atualizados, {id: motivo} dos rejeitados).
+
+    A leitura das regras e os UPDATEs rodam na mesma transação, e cada UPDATE
+    repete a condição de estado: os efeitos (rollups, estoque, outbox) só
+    valem para os pedidos que o UPDATE realmente mudou.
+    'ship' marca o despacho nos envios ativos (OrderShipping.shipped_at), então
+    o status continua igual ao derivado quando um relacionado é gravado depois.
+    """
+    timestamp = now()
+    with transaction.atomic():
+        rows = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids)
+            .annotate(
+                has_payment=_active(OrderPayment),
+                has_delivery=_active(OrderDelivery),
+                has_shipping=_active(OrderShipping),
+            )
+            .values('id', 'status', 'total', 'created_at', 'canceled_at', 'has_carrier',
+                    'has_payment', 'has_delivery', 'has_shipping')
+        )
+
+        found = {row['id'] for row in rows}
+        rejected = {order_id: "Order not found." for order_id in order_ids if order_id not in found}
+        eligible = []
+        for row in rows:
+            reason = _transition_rejection(action, row)
+            if reason:
+                rejected[row['id']] = reason
+            else:
+                row['new_status'] = _target_status(action, row)
+                eligible.append(row)
+
+        if not eligible:
+            return [], rejected
+
+        if action == TRANSITION_CANCEL:
+            claimed = _claim_orders([row['id'] for row in eligible], {
+                'status': TRANSITION_STATUS[action], 'canceled_at': timestamp,
+                **{field: (False if field == 'has_carrier' else None) for field in EVENT_FIELDS},
+            }, action)
+        elif action == TRANSITION_COMPLETE:
+            claimed = _claim_orders([row['id'] for row in eligible], {
+                'status': TRANSITION_STATUS[action], 'completed_at': timestamp,
+            }, action)
+        else:
+            claimed = []
+            by_status = defaultdict(list)
+            for row in eligible:
+                by_status[row['new_status']].append(row['id'])
+            for new_status, ids in by_status.items():
+                claimed += _claim_orders(ids, {'status': new_status, 'last_shipping_at': timestamp}, action)
+
+        claimed = set(claimed)
+        for row in eligible:
+            if row['id'] not in claimed:
+                rejected[row['id']] = "Order changed while processing; try again."
+        eligible = [row for row in eligible if row['id'] in claimed]
+        ids = [row['id'] for row in eligible]
+        if not ids:
+            return [], rejected
+
+        if action == TRANSITION_CANCEL:
+            for model in (OrderDelivery, OrderShipping, OrderPayment):
+                model.objects.filter(order_id__in=ids, canceled=False).update(canceled=True, canceled_at=timestamp)
+            release_stock(ids)
+            ProductSalesDaily.apply_orders([row['id'] for row in eligible if row['status'] == 'completed'], sign=-1)
+
+        elif action == TRANSITION_COMPLETE:
+            ProductSalesDaily.apply_orders(ids)
+            # Efeitos colaterais (AfterShip, e-mail) ficam no outbox
+            NotificationOutbox.objects.bulk_create(
+                [
+                    NotificationOutbox(
+                        order_id=order_id,
+                        kind=NotificationOutbox.KIND_AFTERSHIP,
+                        idempotency_key=f'{NotificationOutbox.KIND_AFTERSHIP}:{order_id}',
+                    )
+                    for order_id in ids
+                ],
+                ignore_conflicts=True,
+            )
+
+        else:
+            OrderShipping.objects.filter(order_id__in=ids, canceled=False).update(shipped_at=timestamp)
+
+        _move_daily_stats([row for row in eligible if row['status'] != row['new_status']])
+        bump_version(DASHBOARD_CACHE)
+
+    return ids, rejected
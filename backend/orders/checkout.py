@@ -0,0 +1,57 @@
+"""
+Checkout em uma transação: pedido, itens, entrega, envio e pagamento.
+
+Substitui as quatro chamadas (orders/, order-delivery/, order-shipping/,
+order-payment/), em que cada passo recalcula eventos e status do pedido.
+Aqui os filhos são gravados com sync_order=False e o status é calculado uma
+única vez, já na inserção do pedido.
+"""
+from django.db import transaction
+from django.utils.timezone import now
+
+from .bulk import ITEM_FIELDS, totals_from_items
+from .inventory import price_items, reserve_stock
+from .models import Order, OrderDelivery, OrderItem, OrderPayment, OrderShipping
+from .tracking import assign_tracking_numbers
+
+
+def checkout(user, items_data, carrier, address, wallet, speed='standard'):
+    price_items(items_data)
+
+    with transaction.atomic():
+        reserve_stock(items_data)
+
+        # Entrega, envio e pagamento ativos: mesmo resultado de derive_status()
+        timestamp = now()
+        order = Order(
+            user=user,
+            stock_reserved=True,
+            last_payment_at=timestamp,
+            last_delivery_at=timestamp,
+            last_shipping_at=timestamp,
+            has_carrier=True,
+            **totals_from_items(items_data),
+        )
+        order.status = order.derive_status()
+        order.save()
+
+        OrderItem.objects.bulk_create(
+            [OrderItem(order=order, **{field: item[field] for field in ITEM_FIELDS}) for item in items_data]
+        )
+
+        delivery = OrderDelivery(order=order, carrier=carrier, speed=speed)
+        assign_tracking_numbers([delivery])
+        delivery.save(sync_order=False)
+        shipping = OrderShipping(order=order, address=address)
+        shipping.save(sync_order=False)
+        payment = OrderPayment(order=order, wallet=wallet)
+        payment.save(sync_order=False)
+
+        # Eventos com os created_at reais, como refresh_related_events() gravaria
+        Order.objects.filter(pk=order.pk).update(
+            last_payment_at=payment.created_at,
+            last_delivery_at=delivery.created_at,
+            last_shipping_at=shipping.created_at,
+        )
+
+    return order
@@ -0,0 +1,121 @@
+"""
+Reserva de estoque dos pedidos.
+
+Os preços vêm sempre do produto (price_sale), nunca do cliente. A reserva é
+um UPDATE condicional por produto (quantity >= n), então compras simultâneas
+do mesmo SKU nunca deixam o estoque negativo, sem SELECT ... FOR UPDATE.
+"""
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from products.models import CATALOG_CACHE, Product
+from products.stock import invalidate_stock_levels
+from wayne_backend.core.cache import bump_version
+
+
+class OutOfStock(ValidationError):
+    """Um ou mais produtos não têm estoque suficiente para o pedido."""
+
+
+def price_items(items_data):
+    """
+    Carrega todos os produtos dos itens em uma query e troca o preço enviado
+    pelo preço de venda atual. Produtos inexistentes ou inativos são rejeitados.
+    """
+    product_ids = {item['product_id'] for item in items_data}
+    products = Product.objects.only('id', 'price_sale', 'is_active').in_bulk(product_ids)
+
+    unavailable = sorted(pid for pid in product_ids if pid not in products or not products[pid].is_active)
+    if unavailable:
+        raise ValidationError(f"Products not available: {', '.join(map(str, unavailable))}.")
+
+    for item in items_data:
+        item['price'] = products[item['product_id']].price_sale
+    return items_data
+
+
+def item_quantities(items_data):
+    quantities = Counter()
+    for item in items_data:
+        quantities[item['product_id']] += item['quantity']
+    return quantities
+
+
+def apply_stock_changes(changes):
+    """
+    Aplica {product_id: quantidade}: positivo reserva, negativo devolve.
+    Tudo ou nada: se algum produto não tiver estoque, a transação inteira
+    (a do checkout, quando houver) é desfeita.
+    """
+    taken = [product_id for product_id, quantity in changes.items() if quantity > 0]
+    returned = [product_id for product_id, quantity in changes.items() if quantity < 0]
+    with transaction.atomic(savepoint=False):
+        restocked = bool(returned) and Product.objects.filter(id__in=returned, quantity=0).exists()
+        # Ordem fixa de ids: transações concorrentes travam as linhas na mesma ordem
+        for product_id in sorted(changes):
+            quantity = changes[product_id]
+            if quantity > 0:
+                reserved = Product.objects.filter(id=product_id, quantity__gte=quantity).update(
+                    quantity=F('quantity') - quantity
+                )
+                if not reserved:
+                    raise OutOfStock(f"Insufficient stock for product {product_id}.")
+            elif quantity < 0:
+                Product.objects.filter(id=product_id).update(quantity=F('quantity') - quantity)
+
+        # UPDATE direto não dispara post_save. A quantity do catálogo em cache vem
+        # das chaves de estoque por produto; a versão do catálogo inteiro só muda
+        # quando um produto esgota ou volta, o que altera o filtro in_stock.
+        if taken or returned:
+            invalidate_stock_levels(taken + returned)
+        sold_out = bool(taken) and Product.objects.filter(id__in=taken, quantity=0).exists()
+        if sold_out or restocked:
+            bump_version(CATALOG_CACHE)
+
+
+def reserve_stock(items_data):
+    apply_stock_changes(item_quantities(items_data))
+
+
+def _claim_reserved_orders(order_ids):
+    """
+    Desliga stock_reserved e devolve só os pedidos que ainda estavam com ele
+    ligado (UPDATE ... RETURNING): dois cancelamentos simultâneos do mesmo
+    pedido nunca devolvem o estoque duas vezes.
+    """
+    from .models import Order
+
+    qn = connection.ops.quote_name
+    table, flag, pk = qn(Order._meta.db_table), qn('stock_reserved'), qn('id')
+    claimed = []
+    order_ids = list(order_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(order_ids), 500):
+            chunk = order_ids[start:start + 500]
+            cursor.execute(
+                f'UPDATE {table} SET {flag} = %s WHERE {flag} = %s AND {pk} IN ({", ".join(["%s"] * len(chunk))}) '
+                f'RETURNING {pk}',
+                [False, True, *chunk],
+            )
+            claimed.extend(row[0] for row in cursor.fetchall())
+    return claimed
+
+
+def release_stock(order_ids):
+    """Devolve ao estoque os itens dos pedidos com reserva ativa."""
+    from .models import OrderItem
+
+    # Devolver nunca falha pela metade: não precisa de savepoint próprio
+    with transaction.atomic(savepoint=False):
+        claimed = _claim_reserved_orders(order_ids)
+        if not claimed:
+            return
+        quantities = (
+            OrderItem.objects.filter(order_id__in=claimed)
+            .values('product_id')
+            .annotate(quantity=Sum('quantity'))
+        )
+        apply_stock_changes({row['product_id']: -row['quantity'] for row in quantities})
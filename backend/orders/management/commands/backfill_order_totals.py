@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.models import Order, OrderItem, TOTAL_FIELDS, calculate_totals, item_totals_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recalculates the persisted totals (sub_total, discount, shippingFee, tax, total) of every order in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of orders processed per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        last_id = 0
+        updated = 0
+
+        while True:
+            orders = list(Order.objects.filter(id__gt=last_id).order_by('id').only('id', *TOTAL_FIELDS)[:chunk_size])
+            if not orders:
+                break
+
+            # Uma única agregação agrupada por pedido para o chunk inteiro
+            aggregates = {
+                row['order_id']: row
+                for row in OrderItem.objects
+                .filter(order_id__in=[order.id for order in orders])
+                .values('order_id')
+                .annotate(**item_totals_aggregates())
+            }
+
+            for order in orders:
+                row = aggregates.get(order.id, {})
+                totals = calculate_totals(row.get('sub_total'), row.get('discountable'))
+                for field, value in totals.items():
+                    setattr(order, field, value)
+
+            with transaction.atomic():
+                Order.objects.bulk_update(orders, TOTAL_FIELDS)
+
+            updated += len(orders)
+            last_id = orders[-1].id
+            self.stdout.write(f"♻️ Recalculated totals up to order #{last_id} ({updated} orders)")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Totals recalculated for {updated} orders."))
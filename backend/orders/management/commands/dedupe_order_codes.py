@@ -0,0 +1,76 @@
+"""
+Renumera códigos de pedido repetidos por usuário, deixados pela atribuição
+antiga (último pedido + 1, sem contador), antes de o migrate criar a
+constraint uniq_order_user_code.
+
+Roda no entrypoint ANTES do migrate, então usa SQL direto só sobre as colunas
+id/user_id/code, que já existiam no schema antigo. Em um banco novo (sem a
+tabela) não faz nada.
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from orders.models import Order, OrderCodeCounter, format_order_code
+
+
+def renumber_duplicate_codes(table=None, counter_table=None):
+    """
+    Mantém o código no pedido mais antigo de cada (user, code) e dá aos outros
+    códigos novos depois do maior código do usuário. Ajusta o OrderCodeCounter
+    (se a tabela já existir) para não reemitir esses códigos.
+    Devolve [(id, código antigo, código novo)].
+    """
+    qn = connection.ops.quote_name
+    table = table or Order._meta.db_table
+    counter_table = counter_table or OrderCodeCounter._meta.db_table
+    existing_tables = connection.introspection.table_names()
+    if table not in existing_tables:
+        return []
+
+    orders = qn(table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT o.id, o.user_id, o.code FROM {orders} o WHERE EXISTS ('
+            f'SELECT 1 FROM {orders} d WHERE d.user_id = o.user_id AND d.code = o.code AND d.id < o.id'
+            f') ORDER BY o.user_id, o.id'
+        )
+        duplicates = cursor.fetchall()
+        if not duplicates:
+            return []
+
+        user_ids = sorted({user_id for _, user_id, _ in duplicates})
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        cursor.execute(f'SELECT user_id, code FROM {orders} WHERE user_id IN ({placeholders})', user_ids)
+        highest = dict.fromkeys(user_ids, 0)
+        for user_id, code in cursor.fetchall():
+            if code and code.isdigit():
+                highest[user_id] = max(highest[user_id], int(code))
+
+        changes = []
+        for order_id, user_id, code in duplicates:
+            highest[user_id] += 1
+            changes.append((order_id, code, format_order_code(highest[user_id])))
+
+        cursor.executemany(
+            f'UPDATE {orders} SET {qn("code")} = %s WHERE id = %s',
+            [(new_code, order_id) for order_id, _, new_code in changes],
+        )
+        if counter_table in existing_tables:
+            counters = qn(counter_table)
+            cursor.executemany(
+                f'UPDATE {counters} SET last_code = %s WHERE user_id = %s AND last_code < %s',
+                [(last_code, user_id, last_code) for user_id, last_code in highest.items()],
+            )
+    return changes
+
+
+class Command(BaseCommand):
+    help = 'Renumbers duplicate (user, code) order codes so the uniq_order_user_code constraint can be applied'
+
+    def handle(self, *args, **options):
+        changes = renumber_duplicate_codes()
+        for order_id, old_code, new_code in changes:
+            self.stdout.write(f"♻️ Order #{order_id}: {old_code} → {new_code}")
+        if changes:
+            self.stdout.write("ℹ️ Run rebuild_order_search after migrate to reindex the new codes.")
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(changes)} duplicate order codes renumbered."))
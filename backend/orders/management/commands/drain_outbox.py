@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Sends pending order notifications (AfterShip tracking, confirmation email) from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Notifications claimed per batch')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent HTTP/SMTP sends')
+        parser.add_argument('--max-attempts', type=int, default=8, help='Attempts before a notification is marked failed')
+        parser.add_argument('--forever', action='store_true', help='Keep polling the outbox instead of exiting when empty')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --forever')
+
+    def handle(self, *args, **options):
+        while True:
+            stats = drain_outbox(
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                max_attempts=options['max_attempts'],
+            )
+            if any(stats.values()):
+                self.stdout.write(
+                    f"📬 Sent: {stats['sent']} | Retrying: {stats['retried']} | "
+                    f"Failed: {stats['failed']} | Skipped: {stats['skipped']}"
+                )
+
+            if not options['forever']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("✅ Outbox drained."))
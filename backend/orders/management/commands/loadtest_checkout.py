@@ -0,0 +1,232 @@
+import datetime
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from address.models import Address
+from carrier.models import Carrier
+from orders.models import Order
+from products.models import Product
+from wallet.models import Wallet
+
+User = get_user_model()
+
+STEPS = ['orders', 'order-delivery', 'order-shipping', 'order-payment']
+COMPOSITE_STEPS = ['orders/checkout']
+
+
+def percentile(values, pct):
+    """Percentil por nearest-rank (values já ordenados)."""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a buyer, carrier, address, wallet and products, then drives N concurrent checkouts '
+        '(orders/ -> order-delivery/ -> order-shipping/ -> order-payment/, or orders/checkout/ with --composite) '
+        'through the API and reports throughput, p50/p95/p99 latency and queries per step'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=100, help='Number of checkouts to run')
+        parser.add_argument('--concurrency', type=int, default=4, help='Number of concurrent buyers (threads)')
+        parser.add_argument('--products', type=int, default=5, help='Number of products to seed')
+        parser.add_argument('--items', type=int, default=2, help='Items per order')
+        parser.add_argument('--composite', action='store_true', help='Use the single-call orders/checkout/ endpoint')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data and created orders')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        checkouts = max(1, options['checkouts'])
+        concurrency = max(1, options['concurrency'])
+        items_per_order = max(1, options['items'])
+
+        fixtures = self.seed(max(1, options['products']), stock=checkouts * items_per_order * 10)
+        self.results = defaultdict(list)  # {step: [(segundos, queries, ok)]}
+        self.lock = threading.Lock()
+        self.remaining = checkouts
+        self.composite = options['composite']
+
+        try:
+            # O test client usa o host "testserver"
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                started = time.perf_counter()
+                threads = [
+                    threading.Thread(target=self.buyer, args=(fixtures, items_per_order))
+                    for _ in range(concurrency)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+
+            report = self.build_report(checkouts, concurrency, elapsed)
+            if options['json']:
+                self.stdout.write(json.dumps(report, indent=2))
+            else:
+                self.print_report(report)
+        finally:
+            if options['keep']:
+                self.stdout.write(f"📌 Seeded data kept (user {fixtures['user'].email}).")
+            else:
+                self.cleanup(fixtures)
+
+    # ---------------------------------------------------------------- seed
+
+    def seed(self, product_count, stock):
+        tag = uuid.uuid4().hex[:6]
+        user = User.objects.create_user(
+            first_name='Load',
+            last_name='Test',
+            email=f'loadtest-{tag}@wayne.local',
+            birth_date=datetime.date(1980, 1, 1),
+            cpf=''.join(random.choices('0123456789', k=11)),
+            phone='31999999999',
+            password=uuid.uuid4().hex,
+            username=f'loadtest-{tag}',
+        )
+        carrier = Carrier.objects.create(name=f'Load Test {tag}', prefix=f'L{tag[:3].upper()}', slug=f'loadtest-{tag}')
+        address = Address.objects.create(
+            user=user, street='Load Test Street', number='1', city='Gotham', state='NJ', postal_code='07001'
+        )
+        wallet = Wallet.objects.create(
+            user=user, name='Load Test', number='4111111111111111',
+            expiry=datetime.date(2099, 1, 1), cvc='123', brand='Visa'
+        )
+        products = [
+            Product.objects.create(
+                title=f'Load Test {tag} #{i}', description='Load test product', category='Load Test',
+                quantity=stock, price_regular=Decimal('100.00'), price_sale=Decimal('90.00'), tax=Decimal('0.00'),
+            )
+            for i in range(product_count)
+        ]
+        self.stdout.write(f"🌱 Seeded user {user.email}, carrier {carrier.prefix} and {len(products)} products.")
+        return {'user': user, 'carrier': carrier, 'address': address, 'wallet': wallet, 'products': products}
+
+    def cleanup(self, fixtures):
+        # Os sinais de delete tiram os pedidos dos rollups do dashboard
+        Order.objects.filter(user=fixtures['user']).delete()
+        Product.objects.filter(id__in=[p.id for p in fixtures['products']]).delete()
+        fixtures['user'].delete()  # endereço e carteira vão em cascata
+        fixtures['carrier'].delete()
+        self.stdout.write("🧹 Load test data removed.")
+
+    # ------------------------------------------------------------- buyers
+
+    def next_checkout(self):
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def buyer(self, fixtures, items_per_order):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(fixtures['user'])
+        try:
+            while self.next_checkout():
+                self.checkout(client, fixtures, items_per_order)
+        finally:
+            connection.close()
+
+    def step(self, client, name, payload):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.post(f'/api/{name}/', payload, format='json')
+            elapsed = time.perf_counter() - started
+        ok = response.status_code == 201
+        with self.lock:
+            self.results[name].append((elapsed, len(context), ok))
+        return response if ok else None
+
+    def checkout(self, client, fixtures, items_per_order):
+        started = time.perf_counter()
+        products = random.sample(fixtures['products'], min(items_per_order, len(fixtures['products'])))
+        items = [{'product_id': p.id, 'quantity': 1} for p in products]
+
+        if self.composite:
+            response = self.step(client, 'orders/checkout', {
+                'items': items,
+                'carrier': fixtures['carrier'].id,
+                'address': fixtures['address'].id,
+                'wallet': fixtures['wallet'].id,
+            })
+        else:
+            response = self.step(client, 'orders', {'items': items})
+        if response is None:
+            return
+        order_id = response.json()['id']
+
+        for name, payload in () if self.composite else (
+            ('order-delivery', {'order': order_id, 'carrier': fixtures['carrier'].id}),
+            ('order-shipping', {'order': order_id, 'address': fixtures['address'].id}),
+            ('order-payment', {'order': order_id, 'wallet': fixtures['wallet'].id}),
+        ):
+            if self.step(client, name, payload) is None:
+                return
+
+        with self.lock:
+            self.results['checkout'].append((time.perf_counter() - started, 0, True))
+
+    # ------------------------------------------------------------- report
+
+    def build_report(self, checkouts, concurrency, elapsed):
+        steps = {}
+        for name in (COMPOSITE_STEPS if self.composite else STEPS) + ['checkout']:
+            rows = self.results.get(name, [])
+            latencies = sorted(seconds * 1000 for seconds, _, ok in rows if ok)
+            queries = [count for _, count, ok in rows if ok]
+            steps[name] = {
+                'ok': len(latencies),
+                'errors': sum(1 for *_, ok in rows if not ok),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'queries_avg': round(sum(queries) / len(queries), 1) if queries and name != 'checkout' else None,
+                'queries_max': max(queries) if queries and name != 'checkout' else None,
+            }
+        completed = steps['checkout']['ok']
+        return {
+            'checkouts': checkouts,
+            'concurrency': concurrency,
+            'completed': completed,
+            'elapsed_s': round(elapsed, 3),
+            'throughput_per_s': round(completed / elapsed, 2) if elapsed else None,
+            'steps': steps,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"\n🧪 Checkout load test: {report['checkouts']} checkouts, concurrency {report['concurrency']}\n"
+        )
+        self.stdout.write(f"{'step':<16}{'ok':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries avg/max':>18}")
+        for name, row in report['steps'].items():
+            queries = f"{row['queries_avg']}/{row['queries_max']}" if row['queries_avg'] is not None else '-'
+            self.stdout.write(
+                f"{name:<16}{row['ok']:>6}{row['errors']:>6}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{queries:>18}"
+            )
+
+        message = (
+            f" {report['completed']}/{report['checkouts']} checkouts in {report['elapsed_s']}s "
+            f"({report['throughput_per_s']} checkouts/s)"
+        )
+        self.stdout.write("")
+        if report['completed'] == report['checkouts']:
+            self.stdout.write(self.style.SUCCESS(f"✅{message}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"⚠️{message}"))
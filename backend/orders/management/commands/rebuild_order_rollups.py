@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+
+from orders.models import Order, OrderDailyStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the OrderDailyStats rollup (orders and revenue per date/hour/status) from the order table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        # Agrupamento feito no banco, no fuso atual (TIME_ZONE), igual ao apply_delta()
+        rows = (
+            Order.objects
+            .annotate(day=TruncDate('created_at'), hour=ExtractHour('created_at'))
+            .values('day', 'hour', 'status')
+            .annotate(order_count=Count('id'), revenue=Sum('total'))
+            .order_by('day', 'hour', 'status')
+        )
+
+        stats = [
+            OrderDailyStats(
+                date=row['day'],
+                hour=row['hour'],
+                status=row['status'],
+                order_count=row['order_count'],
+                revenue=row['revenue'] or 0,
+            )
+            for row in rows.iterator()
+        ]
+
+        with transaction.atomic():
+            OrderDailyStats.objects.all().delete()
+            OrderDailyStats.objects.bulk_create(stats, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Order rollups rebuilt: {len(stats)} buckets."))
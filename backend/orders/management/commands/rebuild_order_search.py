@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from orders.search import rebuild_order_search
+from wayne_backend.core.fts import fts_available
+
+
+class Command(BaseCommand):
+    help = 'Drops and rebuilds the FTS5 order search index (code, customer, tracking, shipping city)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Number of orders indexed per transaction')
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING("⚠️ FTS5 search index is only available on SQLite; nothing to do."))
+            return
+
+        total = rebuild_order_search(chunk_size=max(1, options['chunk_size']))
+        self.stdout.write(self.style.SUCCESS(f"✅ Order search index rebuilt: {total} orders."))
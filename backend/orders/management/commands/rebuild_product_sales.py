@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+from orders.models import ITEM_LINE_TOTAL, OrderItem, ProductSalesDaily
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the ProductSalesDaily rollup (units and revenue per date/product) from completed orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        # Mesmo agrupamento do apply_orders(): data local da conclusão do pedido
+        rows = (
+            OrderItem.objects
+            .filter(order__status='completed')
+            .annotate(day=TruncDate(Coalesce('order__completed_at', 'order__created_at')))
+            .values('day', 'product_id')
+            .annotate(units=Sum('quantity'), revenue=Sum(ITEM_LINE_TOTAL))
+            .order_by('day', 'product_id')
+        )
+        categories = dict(Product.objects.values_list('id', 'category'))
+
+        sales = [
+            ProductSalesDaily(
+                date=row['day'],
+                product_id=row['product_id'],
+                category=categories.get(row['product_id'], ''),
+                units=row['units'] or 0,
+                revenue=row['revenue'] or 0,
+            )
+            for row in rows.iterator()
+        ]
+
+        with transaction.atomic():
+            ProductSalesDaily.objects.all().delete()
+            ProductSalesDaily.objects.bulk_create(sales, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Product sales rebuilt: {len(sales)} buckets."))
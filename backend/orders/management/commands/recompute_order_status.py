@@ -0,0 +1,43 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from orders.models import DASHBOARD_CACHE, Order, derived_status_expression, event_subqueries
+from wayne_backend.core.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the denormalized event timestamps and the derived status of orders with set-based updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Number of order ids covered by each UPDATE')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        bounds = Order.objects.order_by('id').values_list('id', flat=True)
+        first_id, last_id = bounds.first(), bounds.last()
+        if first_id is None:
+            self.stdout.write(self.style.WARNING("⚠️ No orders found."))
+            return
+
+        refreshed = changed = 0
+        for start in range(first_id, last_id + 1, chunk_size):
+            chunk = Order.objects.filter(id__gte=start, id__lt=start + chunk_size)
+            with transaction.atomic():
+                refreshed += chunk.update(**event_subqueries())
+                changed += (
+                    chunk.exclude(status__in=['completed', 'canceled'])
+                    .annotate(derived_status=derived_status_expression())
+                    .exclude(status=F('derived_status'))
+                    .update(status=derived_status_expression())
+                )
+
+        self.stdout.write(f"♻️ Event timestamps refreshed for {refreshed} orders, {changed} status changes.")
+
+        if changed:
+            # Updates em lote não passam pelo Order.save(): refaz o rollup do dashboard
+            call_command('rebuild_order_rollups', stdout=self.stdout)
+            bump_version(DASHBOARD_CACHE)
+
+        self.stdout.write(self.style.SUCCESS("✅ Order status recomputed."))
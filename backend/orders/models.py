@@ -1,16 +1,134 @@
 from django.db import models
+from django.db.models import (
+    Case, DateTimeField, DecimalField, Exists, ExpressionWrapper, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
-from django.utils.functional import cached_property
 from django.core.exceptions import ValidationError
-from django.utils.timezone import now
-import random
+from django.db import IntegrityError, connection, transaction
+from django.utils.timezone import localtime, now
+from datetime import datetime, timezone as dt_timezone
 from decimal import Decimal
 from carrier.models import Carrier
 from address.models import Address
 from wallet.models import Wallet
+from products.models import Product
+from wayne_backend.core.cache import bump_version
+from .inventory import release_stock
+from .tracking import allocate_tracking_numbers
 
 User = get_user_model()
 
+# Namespace do cache das respostas do dashboard (ver views.cache_response)
+DASHBOARD_CACHE = 'orders:dashboard'
+
+TOTAL_FIELDS = ['sub_total', 'discount', 'shippingFee', 'tax', 'total']
+
+ITEM_LINE_TOTAL = ExpressionWrapper(
+    F('quantity') * F('price'),
+    output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+
+def calculate_totals(sub_total, discountable):
+    """
+    Apply the pricing rules to the aggregated item values of an order:
+    - discount: 10% over items priced above 500
+    - shippingFee: free above 500, otherwise 15
+    - tax: 8% over sub_total + shippingFee - discount
+    """
+    sub_total = Decimal(sub_total or 0)
+    discount = round(Decimal(discountable or 0) * Decimal('0.1'), 2)
+    shipping_fee = Decimal(0) if sub_total > 500 else Decimal(15)
+    tax = round((sub_total + shipping_fee - discount) * Decimal('0.08'), 2)
+    total = round(sub_total + shipping_fee + tax - discount, 2)
+    return {
+        'sub_total': sub_total,
+        'discount': discount,
+        'shippingFee': shipping_fee,
+        'tax': tax,
+        'total': total,
+    }
+
+
+# Totais de um pedido sem itens: ponto de partida de todo Order novo
+EMPTY_TOTALS = calculate_totals(0, 0)
+
+
+def item_totals_aggregates():
+    """Aggregates over OrderItem rows consumed by calculate_totals()."""
+    return {
+        'sub_total': Sum(ITEM_LINE_TOTAL),
+        'discountable': Sum(ITEM_LINE_TOTAL, filter=Q(price__gt=500)),
+    }
+
+
+EVENT_FIELDS = ['last_payment_at', 'last_delivery_at', 'last_shipping_at', 'has_carrier']
+
+# Sentinela para comparar timestamps nulos como "nunca aconteceu"
+_NEVER = Value(datetime(1970, 1, 1, tzinfo=dt_timezone.utc), output_field=DateTimeField())
+
+
+def event_subqueries():
+    """Subqueries correlacionadas que recalculam EVENT_FIELDS a partir das tabelas relacionadas."""
+    def latest(model, moment=F('created_at')):
+        return Subquery(
+            model.objects.filter(order_id=OuterRef('pk'), canceled=False)
+            .values('order_id')
+            .annotate(latest=Max(moment))
+            .values('latest')[:1]
+        )
+
+    return {
+        'last_payment_at': latest(OrderPayment),
+        'last_delivery_at': latest(OrderDelivery),
+        # Despacho marcado pela transição 'ship' (ver bulk.py) vale como evento de envio
+        'last_shipping_at': latest(OrderShipping, Coalesce('shipped_at', 'created_at')),
+        'has_carrier': Exists(
+            OrderDelivery.objects.filter(order_id=OuterRef('pk'), canceled=False, carrier__isnull=False)
+        ),
+    }
+
+
+def derived_status_expression():
+    """Versão SQL de Order.derive_status(), usada nas atualizações em lote."""
+    latest_delivery = Coalesce(F('last_delivery_at'), _NEVER)
+    latest_shipping = Coalesce(F('last_shipping_at'), _NEVER)
+    return Case(
+        When(
+            last_payment_at__isnull=True, last_delivery_at__isnull=True, last_shipping_at__isnull=True,
+            then=Value('pending'),
+        ),
+        When(
+            Q(last_payment_at__isnull=False)
+            & Q(last_payment_at__gte=latest_delivery)
+            & Q(last_payment_at__gte=latest_shipping),
+            then=Value('paid'),
+        ),
+        When(
+            Q(last_delivery_at__isnull=False) & Q(last_delivery_at__gte=latest_shipping),
+            then=Value('processing'),
+        ),
+        When(has_carrier=True, then=Value('delivered')),
+        default=Value('shipped'),
+        output_field=models.CharField(),
+    )
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        Carrega tudo o que o OrderSerializer lê em um número fixo de queries,
+        independente da quantidade de pedidos.
+        """
+        return self.select_related('user').prefetch_related(
+            'items',
+            'deliveries',
+            'shippings',
+            'orderPayments',
+        )
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -29,17 +147,34 @@ class Order(models.Model):
     canceled_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    # Totais persistidos, mantidos por refresh_totals() a cada escrita em OrderItem
+    sub_total = models.DecimalField(max_digits=12, decimal_places=2, default=EMPTY_TOTALS['sub_total'])
+    discount = models.DecimalField(max_digits=12, decimal_places=2, default=EMPTY_TOTALS['discount'])
+    shippingFee = models.DecimalField(max_digits=12, decimal_places=2, default=EMPTY_TOTALS['shippingFee'])
+    tax = models.DecimalField(max_digits=12, decimal_places=2, default=EMPTY_TOTALS['tax'])
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=EMPTY_TOTALS['total'])
+
+    # Último evento ativo (não cancelado) de cada tabela relacionada, base do status derivado
+    last_payment_at = models.DateTimeField(null=True, blank=True)
+    last_delivery_at = models.DateTimeField(null=True, blank=True)
+    last_shipping_at = models.DateTimeField(null=True, blank=True)
+    has_carrier = models.BooleanField(default=False)
+
+    # Estoque dos itens baixado na criação (ver orders/inventory.py)
+    stock_reserved = models.BooleanField(default=False)
+
+    objects = OrderQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         is_update = bool(self.pk)
-        old_status = None
+        previous = None
 
         if not self.code:
-            last_order = Order.objects.filter(user=self.user).order_by('-id').first()
-            next_code = int(last_order.code) + 1 if last_order and last_order.code.isdigit() else 1
-            self.code = f'{next_code:04d}'
+            self.code = format_order_code(OrderCodeCounter.reserve(self.user_id)[0])
 
         if is_update:
-            old_status = Order.objects.filter(pk=self.pk).values_list('status', flat=True).first()
+            # (status, total) gravados, usados para mover o pedido entre buckets do rollup
+            previous = Order.objects.filter(pk=self.pk).values_list('status', 'total').first()
 
         if self.status == 'completed' and self.completed_at is None:
             if not self.orderPayments.filter(canceled=False).exists():
@@ -50,14 +185,11 @@ class Order(models.Model):
                 raise ValidationError("Cannot complete order: missing valid shipping.")
             
             self.completed_at = now()
-            super().save(*args, **kwargs)
-
-            # ✅ Enviar notificação para AfterShip
-            try:
-                from .services import send_confirmation_aftership  # coloque a função num arquivo separado
-                send_confirmation_aftership(self)
-            except Exception as e:
-                print(f"⚠️ AfterShip notification failed: {e}")
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self._sync_daily_stats(previous)
+                # ✅ Notificação do AfterShip vai para o outbox (ver drain_outbox)
+                NotificationOutbox.enqueue(self, NotificationOutbox.KIND_AFTERSHIP)
             return
 
         if self.status == 'canceled' and self.canceled_at is None:
@@ -66,40 +198,68 @@ class Order(models.Model):
             self.deliveries.filter(canceled=False).update(canceled=True, canceled_at=now_value)
             self.shippings.filter(canceled=False).update(canceled=True, canceled_at=now_value)
             self.orderPayments.filter(canceled=False).update(canceled=True, canceled_at=now_value)
+            # Todos os eventos foram cancelados acima
+            self.last_payment_at = self.last_delivery_at = self.last_shipping_at = None
+            self.has_carrier = False
+            if self.stock_reserved:
+                release_stock([self.pk])
+                self.stock_reserved = False
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'canceled_at', 'stock_reserved', *EVENT_FIELDS}
 
         super().save(*args, **kwargs)
+        self._sync_daily_stats(previous)
+
+    def delete(self, *args, **kwargs):
+        # Os rollups saem nos receivers de pre/post_delete (signals.py) com os
+        # valores da instância: recarrega o que está gravado antes de apagar
+        previous = Order.objects.filter(pk=self.pk).values_list('status', 'total', 'created_at').first()
+        if previous:
+            self.status, self.total, self.created_at = previous
+        return super().delete(*args, **kwargs)
+
+    def _sync_daily_stats(self, previous):
+        """
+        Mantém os rollups após um save: OrderDailyStats na inserção ou troca de
+        status, ProductSalesDaily quando o pedido entra ou sai de completed.
+        """
+        bump_version(DASHBOARD_CACHE)
+        was_completed = previous is not None and previous[0] == 'completed'
+        if (self.status == 'completed') != was_completed:
+            ProductSalesDaily.apply_orders([self.pk], sign=1 if self.status == 'completed' else -1)
+
+        if previous is None:
+            OrderDailyStats.apply_delta(self.created_at, self.status, count=1, revenue=self.total)
+            return
 
+        old_status, old_total = previous
+        if old_status != self.status:
+            OrderDailyStats.apply_delta(self.created_at, old_status, count=-1, revenue=-old_total)
+            OrderDailyStats.apply_delta(self.created_at, self.status, count=1, revenue=old_total)
 
     def __str__(self):
         return f'Order #{self.code} - {self.user.username}'
 
-    @cached_property
-    def sub_total(self):
-        return sum(item.total_price for item in self.items.all())
-
-    @cached_property
-    def discount(self):
-        return round(
-            sum(
-                item.price * item.quantity * Decimal('0.1')
-                for item in self.items.all()
-                if item.price > 500
-            ),
-            2
-        )
-
-    @cached_property
-    def shippingFee(self):
-        return 0 if self.sub_total > 500 else 15
-
-    @cached_property
-    def tax(self):
-        base = self.sub_total + self.shippingFee - self.discount
-        return round(base * Decimal('0.08'), 2)
+    def refresh_totals(self):
+        """
+        Recalcula os totais a partir dos itens (uma agregação) e grava
+        direto na tabela, sem passar pelo fluxo de status do save().
+        """
+        if not self.pk:
+            return
+        previous = Order.objects.filter(pk=self.pk).values_list('status', 'total', 'created_at').first()
+        if previous is None:
+            return
+        aggregates = self.items.aggregate(**item_totals_aggregates())
+        totals = calculate_totals(aggregates['sub_total'], aggregates['discountable'])
+        Order.objects.filter(pk=self.pk).update(**totals)
+        bump_version(DASHBOARD_CACHE)
+        for field, value in totals.items():
+            setattr(self, field, value)
 
-    @cached_property
-    def total(self):
-        return round(self.sub_total + self.shippingFee + self.tax - self.discount, 2)
+        status, old_total, created_at = previous
+        if totals['total'] != old_total:
+            OrderDailyStats.apply_delta(created_at, status, revenue=totals['total'] - old_total)
 
     class Meta:
         db_table = "order"
@@ -109,32 +269,226 @@ class Order(models.Model):
             models.Index(fields=['code']),
             models.Index(fields=['user']),
             models.Index(fields=['status']),
+            models.Index(fields=['user', '-id'], name='order_user_id_desc_idx'),
+            models.Index(fields=['created_at'], name='order_created_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'code'], name='uniq_order_user_code'),
         ]
 
+    def refresh_related_events(self):
+        """
+        Recalcula EVENT_FIELDS com um único UPDATE e recarrega os campos
+        usados por derive_status(). Chamado dentro da transação de quem
+        gravou o pagamento/entrega/envio.
+        """
+        Order.objects.filter(pk=self.pk).update(**event_subqueries())
+        self.refresh_from_db(fields=EVENT_FIELDS + ['status'])
+
+    def derive_status(self):
+        """Status a partir do evento ativo mais recente, sem consultar o banco."""
+        events = [
+            ('paid', self.last_payment_at),
+            ('processing', self.last_delivery_at),
+            ('shipped', self.last_shipping_at),
+        ]
+        events = [event for event in events if event[1] is not None]
+        if not events:
+            return 'pending'
+
+        # max() devolve o primeiro em caso de empate: paid > processing > shipped
+        latest_status = max(events, key=lambda e: e[1])[0]
+        if latest_status == 'shipped' and self.has_carrier:
+            latest_status = 'delivered'
+        return latest_status
+
     def update_status_from_related_data(self):
         if self.status in ['completed', 'canceled']:
             return
 
-        latest_status = 'pending'
-        payment = self.orderPayments.filter(order_id=self.id, canceled=False).order_by('-created_at').first()
-        delivery = self.deliveries.filter(order_id=self.id, canceled=False).order_by('-created_at').first()
-        shipping = self.shippings.filter(order_id=self.id, canceled=False).order_by('-created_at').first()
-
-        events = []
-        if payment:
-            events.append(('paid', payment.created_at))
-        if delivery:
-            events.append(('processing', delivery.created_at))
-        if shipping:
-            events.append(('shipped', shipping.created_at))
-        if events:
-            events.sort(key=lambda e: e[1], reverse=True)
-            latest_status = events[0][0]
-            if latest_status == 'shipped' and self.deliveries.filter(order_id=self.id, canceled=False, carrier__isnull=False).exists():
-                latest_status = 'delivered'
-
-        self.status = latest_status
-        self.save(update_fields=['status'])
+        latest_status = self.derive_status()
+        if latest_status != self.status:
+            self.status = latest_status
+            self.save(update_fields=['status'])
+
+def increment_counter(model, column, key_column, key, count):
+    """
+    Soma `count` a uma coluna contadora e devolve o novo valor em um único
+    round-trip (UPDATE ... RETURNING), ou None se a linha não existe.
+    """
+    qn = connection.ops.quote_name
+    table, column, key_column = qn(model._meta.db_table), qn(column), qn(key_column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {column} = {column} + %s WHERE {key_column} = %s RETURNING {column}',
+            [count, key],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def format_order_code(number):
+    return f'{number:04d}'
+
+
+class OrderCodeCounter(models.Model):
+    """
+    Último código de pedido emitido por usuário. Incrementado atomicamente no
+    banco, então pedidos simultâneos nunca recebem o mesmo código.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='order_code_counter')
+    last_code = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.last_code}'
+
+    @classmethod
+    def reserve(cls, user_id, count=1):
+        """Reserva `count` códigos consecutivos para o usuário e devolve o range."""
+        last_code = cls._increment(user_id, count)
+        if last_code is None:
+            last_code = cls._create(user_id, count)
+        return range(last_code - count + 1, last_code + 1)
+
+    @classmethod
+    def _increment(cls, user_id, count):
+        return increment_counter(cls, 'last_code', 'user_id', user_id, count)
+
+    @classmethod
+    def _create(cls, user_id, count):
+        # Primeiro pedido com contador: parte do maior código já emitido ao usuário
+        codes = Order.objects.filter(user_id=user_id).values_list('code', flat=True)
+        start = max((int(code) for code in codes if code.isdigit()), default=0)
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, last_code=start + count)
+            return start + count
+        except IntegrityError:
+            # Criado em paralelo por outra requisição
+            return cls._increment(user_id, count)
+
+    class Meta:
+        db_table = "orderCodeCounter"
+        verbose_name = "Order Code Counter"
+        verbose_name_plural = "Order Code Counters"
+
+class OrderDailyStats(models.Model):
+    """
+    Rollup de pedidos por (data, hora, status) no fuso local, mantido
+    incrementalmente pelo Order. Os gráficos do dashboard leem daqui.
+    """
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f'{self.date} {self.hour:02d}h {self.status}: {self.order_count}'
+
+    @classmethod
+    def apply_delta(cls, created_at, status, count=0, revenue=0):
+        """Soma count/revenue no bucket do created_at, criando-o se necessário."""
+        if not count and not revenue:
+            return
+        local = localtime(created_at)
+        bucket = {'date': local.date(), 'hour': local.hour, 'status': status}
+        changes = {'order_count': F('order_count') + count, 'revenue': F('revenue') + revenue}
+
+        if cls.objects.filter(**bucket).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(order_count=count, revenue=revenue, **bucket)
+        except IntegrityError:
+            # Outro processo criou o bucket entre o update e o create
+            cls.objects.filter(**bucket).update(**changes)
+
+    class Meta:
+        db_table = "orderDailyStats"
+        verbose_name = "Order Daily Stats"
+        verbose_name_plural = "Order Daily Stats"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'hour', 'status'], name='uniq_orderdailystats_bucket'),
+        ]
+
+class ProductSalesDaily(models.Model):
+    """
+    Rollup de vendas por (data, produto), mantido quando um pedido entra ou
+    sai de completed. A data é a da conclusão no fuso local; a receita é a
+    soma das linhas (quantidade x preço), sem o desconto do pedido. A
+    categoria é a do produto no momento da venda.
+    Edições de itens de pedidos já concluídos só entram no rebuild_product_sales.
+    """
+    date = models.DateField()
+    product_id = models.IntegerField()
+    category = models.CharField(max_length=100, blank=True)
+    units = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f'{self.date} product #{self.product_id}: {self.units} units'
+
+    @classmethod
+    def rows_for_orders(cls, order_ids):
+        """Agrupa os itens dos pedidos em {(data, product_id): [unidades, receita]}."""
+        buckets = {}
+        items = OrderItem.objects.filter(order_id__in=order_ids).values_list(
+            'order__completed_at', 'order__created_at', 'product_id', 'quantity', 'price'
+        )
+        for completed_at, created_at, product_id, quantity, price in items:
+            key = (localtime(completed_at or created_at).date(), product_id)
+            bucket = buckets.setdefault(key, [0, Decimal('0')])
+            bucket[0] += quantity
+            bucket[1] += quantity * price
+        return buckets
+
+    @classmethod
+    def apply_orders(cls, order_ids, sign=1):
+        """
+        Soma (sign=1) ou subtrai (sign=-1) as vendas dos pedidos com um único
+        upsert em lote (INSERT ... ON CONFLICT DO UPDATE), qualquer que seja o
+        número de pedidos e produtos.
+        """
+        buckets = cls.rows_for_orders(order_ids)
+        if not buckets:
+            return
+        categories = dict(
+            Product.objects.filter(id__in={product_id for _, product_id in buckets}).values_list('id', 'category')
+        )
+
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        date, product_id, category, units, revenue = map(qn, ['date', 'product_id', 'category', 'units', 'revenue'])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} ({date}, {product_id}, {category}, {units}, {revenue}) '
+                f'VALUES (%s, %s, %s, %s, %s) '
+                f'ON CONFLICT ({date}, {product_id}) DO UPDATE SET '
+                f'{units} = {table}.{units} + excluded.{units}, '
+                f'{revenue} = {table}.{revenue} + excluded.{revenue}',
+                [
+                    (
+                        connection.ops.adapt_datefield_value(day),
+                        pid,
+                        categories.get(pid, ''),
+                        sign * total_units,
+                        connection.ops.adapt_decimalfield_value(sign * total_revenue, 14, 2),
+                    )
+                    for (day, pid), (total_units, total_revenue) in buckets.items()
+                ],
+            )
+
+    class Meta:
+        db_table = "productSalesDaily"
+        verbose_name = "Product Sales Daily"
+        verbose_name_plural = "Product Sales Daily"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product_id'], name='uniq_productsalesdaily_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'category'], name='productsales_date_cat_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -145,6 +499,9 @@ class OrderItem(models.Model):
     def __str__(self):
         return f'Product #{self.product_id} (x{self.quantity})'
 
+    # Os totais do pedido são recalculados nos receivers de post_save/post_delete
+    # (signals.py), que também cobrem deletes por queryset (admin)
+
     @property
     def total_price(self):
         return self.quantity * self.price
@@ -180,28 +537,23 @@ class OrderDelivery(models.Model):
         if self.speed not in dict(self.SPEED_CHOICES):
             raise ValidationError({'speed': 'Invalid delivery speed option.'})
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, sync_order=True, **kwargs):
+        """sync_order=False: quem grava calcula os eventos e o status do pedido (ver checkout.py)."""
         self.full_clean()
         if not self.tracking and self.carrier:
-            self.tracking = self.generate_unique_tracking_code(self.carrier.prefix or "TRK")
-        super().save(*args, **kwargs)
-        self.order.update_status_from_related_data()
+            self.tracking = allocate_tracking_numbers(self.carrier.prefix)[0]
+        if not sync_order:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.order.refresh_related_events()
+            self.order.update_status_from_related_data()
 
     def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        self.order.update_status_from_related_data()
-
-    @staticmethod
-    def generate_tracking_code(prefix):
-        number = ''.join(str(random.randint(0, 9)) for _ in range(12))
-        return f"{prefix.upper()}{number}"
-
-    def generate_unique_tracking_code(self, prefix):
-        for _ in range(10):
-            code = self.generate_tracking_code(prefix)
-            if not OrderDelivery.objects.filter(tracking=code).exists():
-                return code
-        raise Exception("Unable to generate unique tracking code after 10 attempts.")
+        with transaction.atomic():
+            super().delete(*args, **kwargs)
+            self.order.refresh_related_events()
+            self.order.update_status_from_related_data()
 
     class Meta:
         db_table = "orderDelivery"
@@ -213,10 +565,38 @@ class OrderDelivery(models.Model):
             models.Index(fields=['tracking']),
         ]
 
+class TrackingSequence(models.Model):
+    """Sequência de números de rastreio por prefixo de transportadora (ver tracking.py)."""
+    prefix = models.CharField(max_length=10, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.prefix}: {self.last_value}'
+
+    @classmethod
+    def reserve(cls, prefix, count):
+        """Reserva `count` valores consecutivos da sequência e devolve o range."""
+        last_value = increment_counter(cls, 'last_value', 'prefix', prefix, count)
+        if last_value is None:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(prefix=prefix, last_value=count)
+                last_value = count
+            except IntegrityError:
+                # Criada em paralelo por outro processo
+                last_value = increment_counter(cls, 'last_value', 'prefix', prefix, count)
+        return range(last_value - count + 1, last_value + 1)
+
+    class Meta:
+        db_table = "trackingSequence"
+        verbose_name = "Tracking Sequence"
+        verbose_name_plural = "Tracking Sequences"
+
 class OrderShipping(models.Model):
     order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='shippings')
     address = models.ForeignKey('address.Address', on_delete=models.PROTECT, related_name='order_shippings')
     created_at = models.DateTimeField(auto_now_add=True)
+    shipped_at = models.DateTimeField(null=True, blank=True)
     canceled = models.BooleanField(default=False)
     canceled_at = models.DateTimeField(null=True, blank=True)
 
@@ -224,13 +604,19 @@ class OrderShipping(models.Model):
     def __str__(self):
         return f"Shipping for Order #{self.order_id} to {self.address}"
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.order.update_status_from_related_data()
+    def save(self, *args, sync_order=True, **kwargs):
+        if not sync_order:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.order.refresh_related_events()
+            self.order.update_status_from_related_data()
 
     def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        self.order.update_status_from_related_data()
+        with transaction.atomic():
+            super().delete(*args, **kwargs)
+            self.order.refresh_related_events()
+            self.order.update_status_from_related_data()
 
     class Meta:
         db_table = "orderShipping"
@@ -253,22 +639,30 @@ class OrderPayment(models.Model):
     def __str__(self):
         return f"Payment for Order #{self.order_id} using {self.wallet}"
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, sync_order=True, **kwargs):
+        if not sync_order:
+            return super().save(*args, **kwargs)
         is_new = self._state.adding
-        super().save(*args, **kwargs)
-        if not self.canceled and is_new:
-            self.order.status = 'paid'
-            self.order.save(update_fields=['status'])
-        else:
-            self.order.update_status_from_related_data()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            bump_version(DASHBOARD_CACHE)
+            self.order.refresh_related_events()
+            if not self.canceled and is_new:
+                self.order.status = 'paid'
+                self.order.save(update_fields=['status'])
+            else:
+                self.order.update_status_from_related_data()
 
     def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        if not self.order.orderPayments.filter(canceled=False).exists():
-            self.order.status = 'canceled'
-            self.order.save(update_fields=['status'])
-        else:
-            self.order.update_status_from_related_data()
+        with transaction.atomic():
+            super().delete(*args, **kwargs)
+            bump_version(DASHBOARD_CACHE)
+            self.order.refresh_related_events()
+            if self.order.last_payment_at is None:
+                self.order.status = 'canceled'
+                self.order.save(update_fields=['status'])
+            else:
+                self.order.update_status_from_related_data()
 
     class Meta:
         db_table = "orderPayment"
@@ -280,3 +674,62 @@ class OrderPayment(models.Model):
             models.Index(fields=['wallet'], name='idx_orderPayment_wallet'),
             models.Index(fields=['canceled'], name='idx_orderPayment_canceled'),
         ]
+
+class NotificationOutbox(models.Model):
+    """
+    Notificações externas gravadas na mesma transação do pedido e enviadas
+    depois pelo comando drain_outbox, com retentativas e backoff exponencial.
+    """
+    KIND_AFTERSHIP = 'aftership_tracking'
+    KIND_CONFIRMATION_EMAIL = 'order_confirmation_email'
+    KIND_CHOICES = [
+        (KIND_AFTERSHIP, 'AfterShip Tracking'),
+        (KIND_CONFIRMATION_EMAIL, 'Order Confirmation Email'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_SKIPPED = 'skipped'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_SKIPPED, 'Skipped'),
+    ]
+
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.kind} for Order {self.order_id} ({self.status})'
+
+    @classmethod
+    def enqueue(cls, order, kind, payload=None):
+        """Enfileira a notificação uma única vez por (tipo, pedido)."""
+        notification, _ = cls.objects.get_or_create(
+            idempotency_key=f'{kind}:{order.pk}',
+            defaults={'order': order, 'kind': kind, 'payload': payload or {}},
+        )
+        return notification
+
+    class Meta:
+        db_table = "notificationOutbox"
+        verbose_name = "Notification Outbox"
+        verbose_name_plural = "Notification Outbox"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='idx_outbox_status_next'),
+            models.Index(fields=['order'], name='idx_outbox_order'),
+        ]
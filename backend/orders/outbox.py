@@ -0,0 +1,141 @@
+"""
+Worker do outbox de notificações (NotificationOutbox).
+
+Cada lote é reivindicado com um UPDATE condicional (vários workers podem rodar
+em paralelo), os payloads são montados na thread principal, as chamadas HTTP e
+SMTP rodam em um pool de threads e os resultados voltam a ser gravados na
+thread principal.
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .models import NotificationOutbox, Order
+from .services import (
+    NotificationSkipped,
+    build_aftership_notification,
+    post_aftership_tracking,
+    send_order_confirmation_email,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60 * 6
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def claim_batch(batch_size):
+    """Reivindica até `batch_size` notificações vencidas (ou com lease expirado)."""
+    current = now()
+    due = Q(status=NotificationOutbox.STATUS_PENDING, next_attempt_at__lte=current) | Q(
+        status=NotificationOutbox.STATUS_PROCESSING, claimed_at__lt=current - CLAIM_LEASE
+    )
+    ids = list(NotificationOutbox.objects.filter(due).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    NotificationOutbox.objects.filter(due, id__in=ids).update(
+        status=NotificationOutbox.STATUS_PROCESSING, claimed_at=current, claim_token=token
+    )
+    return list(NotificationOutbox.objects.filter(claim_token=token, status=NotificationOutbox.STATUS_PROCESSING))
+
+
+def _prepare(notifications):
+    """Monta o que cada envio precisa (acessa o banco, roda na thread principal)."""
+    orders = Order.objects.select_related('user').in_bulk({n.order_id for n in notifications})
+    jobs, skipped = [], []
+
+    for notification in notifications:
+        if notification.kind == NotificationOutbox.KIND_AFTERSHIP:
+            try:
+                data, email_context = build_aftership_notification(orders[notification.order_id])
+            except NotificationSkipped as e:
+                skipped.append((notification, str(e)))
+                continue
+            notification.payload = {'tracking': data, 'email': email_context}
+        jobs.append(notification)
+
+    return jobs, skipped
+
+
+def _deliver(notification):
+    """Executa o envio. Não acessa o banco: roda nas threads do pool."""
+    if notification.kind == NotificationOutbox.KIND_AFTERSHIP:
+        post_aftership_tracking(notification.payload['tracking'], notification.idempotency_key)
+    elif notification.kind == NotificationOutbox.KIND_CONFIRMATION_EMAIL:
+        send_order_confirmation_email(notification.payload)
+    else:
+        raise ValueError(f"Unknown notification kind: {notification.kind}")
+
+
+def _record_success(notification):
+    notification.status = NotificationOutbox.STATUS_SENT
+    notification.sent_at = now()
+    notification.attempts += 1
+    notification.last_error = ''
+    notification.save(update_fields=['status', 'sent_at', 'attempts', 'last_error', 'payload'])
+
+    if notification.kind == NotificationOutbox.KIND_AFTERSHIP:
+        # E-mail de confirmação só depois do AfterShip aceitar o tracking
+        NotificationOutbox.enqueue(
+            notification.order,
+            NotificationOutbox.KIND_CONFIRMATION_EMAIL,
+            payload=notification.payload['email'],
+        )
+
+
+def _record_failure(notification, error, max_attempts):
+    notification.attempts += 1
+    notification.last_error = str(error)[:2000]
+    if notification.attempts >= max_attempts:
+        notification.status = NotificationOutbox.STATUS_FAILED
+        logger.error(f"❌ Notification {notification.idempotency_key} failed permanently: {error}")
+    else:
+        notification.status = NotificationOutbox.STATUS_PENDING
+        notification.next_attempt_at = now() + backoff_delay(notification.attempts)
+        logger.warning(f"⚠️ Notification {notification.idempotency_key} failed (attempt {notification.attempts}): {error}")
+    notification.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at', 'payload'])
+
+
+def drain_outbox(batch_size=50, workers=4, max_attempts=8):
+    """
+    Processa lotes até não haver notificações vencidas.
+    Devolve um dicionário com a contagem de cada resultado.
+    """
+    stats = {'sent': 0, 'retried': 0, 'failed': 0, 'skipped': 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while True:
+            notifications = claim_batch(batch_size)
+            if not notifications:
+                break
+
+            jobs, skipped = _prepare(notifications)
+            for notification, reason in skipped:
+                notification.status = NotificationOutbox.STATUS_SKIPPED
+                notification.last_error = reason
+                notification.save(update_fields=['status', 'last_error'])
+                stats['skipped'] += 1
+
+            futures = [(notification, executor.submit(_deliver, notification)) for notification in jobs]
+            for notification, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    _record_failure(notification, e, max_attempts)
+                    stats['failed' if notification.status == NotificationOutbox.STATUS_FAILED else 'retried'] += 1
+                else:
+                    _record_success(notification)
+                    stats['sent'] += 1
+
+    return stats
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) sobre o id decrescente: cada página é um
+    `id < cursor ORDER BY id DESC LIMIT n`, com custo constante em qualquer página.
+    """
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,130 @@
+"""
+Índice de busca de pedidos (FTS5): código, nome e e-mail do cliente,
+números de rastreio das entregas e cidade do endereço de envio.
+O rowid do índice é o id do pedido.
+"""
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from wayne_backend.core.fts import (
+    create_fts_table,
+    delete_rows,
+    drop_fts_table,
+    fts_available,
+    fts_search,
+    replace_rows,
+)
+
+ORDER_SEARCH_TABLE = 'orderSearch'
+ORDER_SEARCH_COLUMNS = ['code', 'customer', 'email', 'tracking', 'city']
+# Pesos do bm25, na ordem das colunas: código e rastreio valem mais que a cidade
+ORDER_SEARCH_WEIGHTS = [10.0, 4.0, 4.0, 8.0, 1.0]
+
+_pending = threading.local()
+
+
+def ensure_order_search_table(**kwargs):
+    create_fts_table(ORDER_SEARCH_TABLE, ORDER_SEARCH_COLUMNS)
+
+
+def build_documents(order_ids):
+    """Monta as linhas do índice para os pedidos (3 queries, qualquer quantidade)."""
+    from .models import Order, OrderDelivery, OrderShipping
+
+    tracking = defaultdict(list)
+    for order_id, number in OrderDelivery.objects.filter(order_id__in=order_ids).values_list('order_id', 'tracking'):
+        if number:
+            tracking[order_id].append(number)
+
+    cities = defaultdict(set)
+    for order_id, city in OrderShipping.objects.filter(order_id__in=order_ids).values_list('order_id', 'address__city'):
+        cities[order_id].add(city)
+
+    orders = Order.objects.filter(id__in=order_ids).values_list(
+        'id', 'code', 'user__first_name', 'user__last_name', 'user__username', 'user__email'
+    )
+    return [
+        (
+            order_id,
+            code,
+            ' '.join(filter(None, [first_name, last_name, username])),
+            email,
+            ' '.join(tracking[order_id]),
+            ' '.join(sorted(cities[order_id])),
+        )
+        for order_id, code, first_name, last_name, username, email in orders
+    ]
+
+
+def index_orders(order_ids):
+    """(Re)indexa os pedidos; ids que não existem mais saem do índice."""
+    order_ids = set(order_ids)
+    if not order_ids or not fts_available():
+        return
+    rows = build_documents(order_ids)
+    delete_rows(ORDER_SEARCH_TABLE, order_ids - {row[0] for row in rows})
+    replace_rows(ORDER_SEARCH_TABLE, ORDER_SEARCH_COLUMNS, rows)
+
+
+def _flush_pending():
+    order_ids = getattr(_pending, 'order_ids', set())
+    _pending.order_ids = set()
+    index_orders(order_ids)
+
+
+def schedule_reindex(order_ids):
+    """
+    Agenda a reindexação para depois do commit. Vários saves na mesma
+    transação (pedido, entrega, envio...) viram uma única reindexação.
+    """
+    if not fts_available():
+        return
+    if not hasattr(_pending, 'order_ids'):
+        _pending.order_ids = set()
+    _pending.order_ids.update(order_ids)
+    transaction.on_commit(_flush_pending)
+
+
+def rebuild_order_search(chunk_size=2000):
+    """Recria o índice do zero. Devolve o número de pedidos indexados."""
+    from .models import Order
+
+    if not fts_available():
+        return 0
+    drop_fts_table(ORDER_SEARCH_TABLE)
+    ensure_order_search_table()
+
+    total, last_id = 0, 0
+    while True:
+        ids = list(Order.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        with transaction.atomic():
+            replace_rows(ORDER_SEARCH_TABLE, ORDER_SEARCH_COLUMNS, build_documents(ids))
+        total += len(ids)
+        last_id = ids[-1]
+
+
+def search_order_ids(text, limit=50):
+    """Ids dos pedidos que casam com `text`, do mais para o menos relevante."""
+    from .models import Order
+
+    if fts_available():
+        return [rowid for rowid, _ in fts_search(ORDER_SEARCH_TABLE, text, ORDER_SEARCH_WEIGHTS, limit=limit)]
+
+    # Outros bancos: filtro simples sobre os mesmos campos
+    text = (text or '').strip()
+    if not text:
+        return []
+    condition = (
+        Q(code__iexact=text)
+        | Q(user__email__icontains=text)
+        | Q(user__first_name__icontains=text)
+        | Q(user__last_name__icontains=text)
+        | Q(deliveries__tracking__iexact=text)
+        | Q(shippings__address__city__icontains=text)
+    )
+    return list(Order.objects.filter(condition).order_by('-id').values_list('id', flat=True).distinct()[:limit])
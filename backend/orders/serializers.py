@@ -1,17 +1,62 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem, OrderDelivery, OrderShipping, OrderPayment
+from .bulk import TRANSITION_STATUS, bulk_create_orders, sync_order_items
+from .checkout import checkout
+from .inventory import price_items, reserve_stock
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from address.models import Address
+from carrier.models import Carrier
+from permissions.principal import get_principal
+from products.summaries import get_product_summaries
+from wallet.models import Wallet
 
 User = get_user_model()
 
+PRODUCT_SUMMARIES = 'product_summaries'
+
+
+def wants_product_expansion(context):
+    """True quando a requisição pede ?expand=product."""
+    request = context.get('request')
+    if request is None or not hasattr(request, 'query_params'):
+        return False
+    return 'product' in request.query_params.get('expand', '').split(',')
+
+
+def checkout_error(error):
+    """Produto indisponível ou sem estoque vira um 400 no campo items."""
+    return serializers.ValidationError({'items': error.messages})
+
+
+def load_product_summaries(context, orders):
+    """
+    Resolve de uma vez os resumos de produto de todos os itens dos pedidos.
+    Produtos secretos só aparecem para quem tem o grupo Secret.
+    """
+    product_ids = {item.product_id for order in orders for item in order.items.all()}
+    include_secret = get_principal(context.get('request')).can_view_secret
+    context[PRODUCT_SUMMARIES] = get_product_summaries(product_ids, include_secret=include_secret)
+
 class OrderItemSerializer(serializers.ModelSerializer):
+    # Opcional na escrita: identifica o item existente na atualização do pedido
+    id = serializers.IntegerField(required=False)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ['id', 'product_id', 'quantity', 'price', 'total_price']
-        read_only_fields = ['id', 'total_price']
+        # O preço vem sempre do produto (price_items), nunca do cliente
+        read_only_fields = ['price', 'total_price']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        summaries = self.context.get(PRODUCT_SUMMARIES)
+        if summaries is not None:
+            data['product'] = summaries.get(instance.product_id)
+        return data
 
 class UserSummarySerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField(read_only=True)
@@ -33,18 +78,100 @@ class OrderShippingSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderShipping
         fields = '__all__'
+        read_only_fields = ['shipped_at']
 
 class OrderPaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderPayment
         fields = '__all__'
 
+class OrderTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=1000)
+    action = serializers.ChoiceField(choices=list(TRANSITION_STATUS))
+
+class CheckoutSerializer(serializers.Serializer):
+    """Checkout completo em uma chamada (POST orders/checkout/)."""
+    items = OrderItemSerializer(many=True)
+    carrier = serializers.PrimaryKeyRelatedField(queryset=Carrier.objects.filter(is_active=True))
+    address = serializers.PrimaryKeyRelatedField(queryset=Address.objects.filter(is_active=True))
+    wallet = serializers.PrimaryKeyRelatedField(queryset=Wallet.objects.filter(status=Wallet.STATUS_ACTIVE))
+    speed = serializers.ChoiceField(choices=OrderDelivery.SPEED_CHOICES, default='standard')
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("The order must contain at least one item.")
+        return value
+
+    def validate(self, attrs):
+        if 'user_id' in attrs and not isinstance(self.parent, BulkOrderListSerializer):
+            raise serializers.ValidationError({'user_id': "Only accepted when bulk creating orders (orders/bulk/)."})
+        return attrs
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        if attrs['address'].user_id != user.id:
+            raise serializers.ValidationError({'address': "Address does not belong to the user."})
+        if attrs['wallet'].user_id != user.id:
+            raise serializers.ValidationError({'wallet': "Wallet does not belong to the user."})
+        return attrs
+
+    def create(self, validated_data):
+        try:
+            return checkout(self.context['request'].user, validated_data.pop('items'), **validated_data)
+        except DjangoValidationError as e:
+            raise checkout_error(e)
+
+class BulkOrderListSerializer(serializers.ListSerializer):
+    """Criação de vários pedidos em uma transação (POST orders/bulk/)."""
+    max_orders = 500
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("Send at least one order.")
+        if len(attrs) > self.max_orders:
+            raise serializers.ValidationError(f"At most {self.max_orders} orders per request.")
+        self.resolve_owners(attrs)
+        return attrs
+
+    def resolve_owners(self, attrs):
+        """
+        `user_id` por pedido (importação da equipe): todos os donos em uma query.
+        Sem ele o pedido fica com quem envia a requisição.
+        """
+        owner_ids = {row['user_id'] for row in attrs if 'user_id' in row}
+        if not owner_ids:
+            return
+        if not get_principal(self.context.get('request')).is_staff:
+            raise serializers.ValidationError("Only staff can create orders for other users.")
+
+        owners = User.objects.filter(is_active=True).in_bulk(owner_ids)
+        missing = sorted(owner_ids - owners.keys())
+        if missing:
+            raise serializers.ValidationError(f"Unknown or inactive users: {missing}.")
+        for row in attrs:
+            if 'user_id' in row:
+                row['user'] = owners[row.pop('user_id')]
+
+    def create(self, validated_data):
+        try:
+            return bulk_create_orders(self.context['request'].user, validated_data)
+        except DjangoValidationError as e:
+            raise checkout_error(e)
+
+    def to_representation(self, data):
+        if wants_product_expansion(self.context) and PRODUCT_SUMMARIES not in self.context:
+            data = list(data.all() if hasattr(data, 'all') else data)
+            load_product_summaries(self.context, data)
+        return super().to_representation(data)
+
 class OrderSerializer(serializers.ModelSerializer):
     user = UserSummarySerializer(read_only=True)
+    # Dono do pedido, só no bulk (POST orders/bulk/); resolvido pelo BulkOrderListSerializer
+    user_id = serializers.IntegerField(write_only=True, required=False)
     items = OrderItemSerializer(many=True)
-    delivery = OrderDeliverySerializer(source='orderDelivery', many=True, read_only=True)
-    shipping = OrderShippingSerializer(source='orderShipping', many=True, read_only=True)
-    payment = OrderPaymentSerializer(source='orderPayment', many=True, read_only=True)
+    delivery = OrderDeliverySerializer(source='deliveries', many=True, read_only=True)
+    shipping = OrderShippingSerializer(source='shippings', many=True, read_only=True)
+    payment = OrderPaymentSerializer(source='orderPayments', many=True, read_only=True)
     sub_total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     discount = serializers.SerializerMethodField(read_only=True)
     tax = serializers.SerializerMethodField(read_only=True)
@@ -57,6 +184,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'id', 
             'code', 
             'user', 
+            'user_id',
             'items',
             'delivery',
             'shipping',
@@ -71,6 +199,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'completed_at',
             'status'
         ]
+        list_serializer_class = BulkOrderListSerializer
         read_only_fields = [
             'id', 
             'code', 
@@ -97,30 +226,46 @@ class OrderSerializer(serializers.ModelSerializer):
     def get_total(self, obj):
         return Decimal(obj.total)
 
+    def to_representation(self, instance):
+        # Pedido único (detalhe); nas listas o BulkOrderListSerializer já resolveu a página inteira
+        if wants_product_expansion(self.context) and PRODUCT_SUMMARIES not in self.context:
+            load_product_summaries(self.context, [instance])
+        return super().to_representation(instance)
+
     def validate_items(self, value):
         if not value:
             raise serializers.ValidationError("The order must contain at least one item.")
         return value
 
+    def validate(self, attrs):
+        if 'user_id' in attrs and not isinstance(self.parent, BulkOrderListSerializer):
+            raise serializers.ValidationError({'user_id': "Only accepted when bulk creating orders (orders/bulk/)."})
+        return attrs
+
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
-        order = Order.objects.create(user=self.context['request'].user, **validated_data)
-        for item_data in items_data:
-            self._clean_item_data(item_data)
-            OrderItem.objects.create(order=order, **item_data)
+        try:
+            price_items(items_data)
+            with transaction.atomic():
+                reserve_stock(items_data)
+                order = Order.objects.create(user=self.context['request'].user, stock_reserved=True, **validated_data)
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, product_id=item['product_id'], quantity=item['quantity'], price=item['price'])
+                    for item in items_data
+                ])
+                order.refresh_totals()
+        except DjangoValidationError as e:
+            raise checkout_error(e)
         return order
 
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', None)
         instance.status = validated_data.get('status', instance.status)
-        instance.save()
-        if items_data is not None:
-            instance.items.all().delete()
-            for item_data in items_data:
-                self._clean_item_data(item_data)
-                OrderItem.objects.create(order=instance, **item_data)
+        with transaction.atomic():
+            instance.save()
+            if items_data is not None:
+                try:
+                    sync_order_items(instance, items_data)
+                except DjangoValidationError as e:
+                    raise checkout_error(e)
         return instance
-
-    def _clean_item_data(self, item_data):
-        for extra_field in ['title', 'sku', 'image']:
-            item_data.pop(extra_field, None)
@@ -8,11 +8,22 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-def send_confirmation_aftership(order):
-    delivery = order.deliveries.filter(canceled=False).first()
+# AfterShip responde 4003 quando o tracking já foi cadastrado (reenvio idempotente)
+AFTERSHIP_TRACKING_EXISTS = 4003
+
+
+class NotificationSkipped(Exception):
+    """O pedido não tem os dados necessários para a notificação; não adianta tentar de novo."""
+
+
+def build_aftership_notification(order):
+    """
+    Monta o payload da notificação do AfterShip e o contexto do e-mail de
+    confirmação. Lê o banco, então deve rodar fora das threads de envio.
+    """
+    delivery = order.deliveries.select_related('carrier').filter(canceled=False).first()
     if not delivery:
-        logger.warning(f"Order {order.id} has no valid delivery to notify AfterShip.")
-        return
+        raise NotificationSkipped(f"Order {order.id} has no valid delivery to notify AfterShip.")
 
     tracking_number = delivery.tracking
     carrier_slug = getattr(delivery.carrier, 'slug', None)
@@ -20,13 +31,7 @@ def send_confirmation_aftership(order):
     customer_name = order.user.get_full_name() or order.user.username
 
     if not tracking_number or not carrier_slug or not user_email:
-        logger.warning(f"Missing data to notify AfterShip (Order #{order.id}).")
-        return
-
-    headers = {
-        "aftership-api-key": settings.AFTERSHIP_API_KEY,
-        "Content-Type": "application/json"
-    }
+        raise NotificationSkipped(f"Missing data to notify AfterShip (Order #{order.id}).")
 
     data = {
         "tracking": {
@@ -40,39 +45,64 @@ def send_confirmation_aftership(order):
         }
     }
 
-    try:
-        response = requests.post("https://api.aftership.com/v4/trackings", json=data, headers=headers)
-        response.raise_for_status()
-        logger.info(f"📦 AfterShip: notification sent successfully for order #{order.code}")
+    email_context = {
+        "user_email": user_email,
+        "customer_name": customer_name,
+        "order_code": order.code,
+        "tracking_number": tracking_number,
+        "tracking_url": f"https://track.aftership.com/{carrier_slug}/{tracking_number}",
+        "company_name": "Wayne Industries",
+        "current_year": datetime.now().year
+    }
 
-        # Send confirmation email
-        tracking_url = f"https://track.aftership.com/{carrier_slug}/{tracking_number}"
-        subject = f"Order Confirmation #{order.code}"
+    return data, email_context
+
+
+def post_aftership_tracking(data, idempotency_key):
+    """
+    Cadastra o tracking no AfterShip. Não acessa o banco (seguro em threads).
+    Um tracking já existente é tratado como sucesso.
+    """
+    headers = {
+        "aftership-api-key": settings.AFTERSHIP_API_KEY,
+        "Content-Type": "application/json",
+        "Idempotency-Key": idempotency_key,
+    }
+
+    response = requests.post(
+        settings.AFTERSHIP_API_URL,
+        json=data,
+        headers=headers,
+        timeout=settings.AFTERSHIP_TIMEOUT,
+    )
+
+    if response.status_code in (400, 409):
+        try:
+            code = response.json().get("meta", {}).get("code")
+        except ValueError:
+            code = None
+        if code == AFTERSHIP_TRACKING_EXISTS:
+            logger.info(f"📦 AfterShip: tracking already registered ({idempotency_key})")
+            return
+
+    response.raise_for_status()
+    logger.info(f"📦 AfterShip: notification sent successfully for order #{data['tracking']['order_number']}")
 
-        context = {
-            "customer_name": customer_name,
-            "order_code": order.code,
-            "tracking_number": tracking_number,
-            "tracking_url": tracking_url,
-            "company_name": "Wayne Industries",
-            "current_year": datetime.now().year
-        }
 
-        html_message = render_to_string("order_confirmation.html", context)
-        plain_message = strip_tags(html_message)
+def send_order_confirmation_email(context):
+    """Envia o e-mail de confirmação do pedido. Não acessa o banco (seguro em threads)."""
+    subject = f"Order Confirmation #{context['order_code']}"
 
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user_email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+    html_message = render_to_string("order_confirmation.html", context)
+    plain_message = strip_tags(html_message)
 
-        logger.info(f"📧 Confirmation email sent to {user_email}")
+    send_mail(
+        subject=subject,
+        message=plain_message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[context["user_email"]],
+        html_message=html_message,
+        fail_silently=False,
+    )
 
-    except requests.RequestException as e:
-        logger.error(f"❌ AfterShip: failed to notify order #{order.code}: {e}")
-    except Exception as e:
-        logger.error(f"❌ Failed to send email to {user_email}: {e}")
+    logger.info(f"📧 Confirmation email sent to {context['user_email']}")
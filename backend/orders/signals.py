@@ -0,0 +1,77 @@
+"""
+Mantém em sincronia o índice de busca de pedidos (orders/search.py), os
+totais persistidos do pedido quando itens mudam e os rollups do dashboard
+quando pedidos são apagados.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from wayne_backend.core.cache import bump_version
+from .models import (
+    DASHBOARD_CACHE, Order, OrderDailyStats, OrderDelivery, OrderItem, OrderShipping, ProductSalesDaily,
+)
+from .search import schedule_reindex
+
+# Só campos que entram no documento do cliente
+CUSTOMER_FIELDS = {'first_name', 'last_name', 'username', 'email'}
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def reindex_order(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'code' not in update_fields and 'user' not in update_fields:
+        return
+    schedule_reindex([instance.pk])
+
+
+@receiver(post_save, sender=OrderDelivery)
+@receiver(post_delete, sender=OrderDelivery)
+@receiver(post_save, sender=OrderShipping)
+@receiver(post_delete, sender=OrderShipping)
+def reindex_order_relation(sender, instance, **kwargs):
+    schedule_reindex([instance.order_id])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindex_customer_orders(sender, instance, created, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if created or (update_fields is not None and not CUSTOMER_FIELDS & set(update_fields)):
+        return
+    schedule_reindex(Order.objects.filter(user=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=OrderItem)
+def refresh_totals_after_item_save(sender, instance, **kwargs):
+    instance.order.refresh_totals()
+
+
+@receiver(post_delete, sender=OrderItem)
+def refresh_totals_after_item_delete(sender, instance, origin=None, **kwargs):
+    # Itens apagados junto com o pedido (ou o usuário) não recalculam nada:
+    # o pedido some em seguida e remove_from_daily_stats tira o total gravado
+    if isinstance(origin, OrderItem):
+        instance.order.refresh_totals()
+    elif getattr(origin, 'model', None) is OrderItem:
+        # Delete por queryset: os sinais saem depois que todas as linhas foram
+        # apagadas, então basta um recálculo por pedido
+        refreshed = origin.__dict__.setdefault('_refreshed_order_ids', set())
+        if instance.order_id not in refreshed:
+            refreshed.add(instance.order_id)
+            Order(pk=instance.order_id).refresh_totals()
+
+
+# Deletes por queryset (admin) e em cascata (usuário apagado) não passam pelo
+# Order.delete(), mas disparam estes sinais para cada pedido.
+@receiver(pre_delete, sender=Order)
+def reverse_product_sales(sender, instance, **kwargs):
+    # pre_delete: os itens ainda existem (o Collector apaga tudo depois dos sinais)
+    if instance.status == 'completed':
+        ProductSalesDaily.apply_orders([instance.pk], sign=-1)
+
+
+@receiver(post_delete, sender=Order)
+def remove_from_daily_stats(sender, instance, **kwargs):
+    OrderDailyStats.apply_delta(instance.created_at, instance.status, count=-1, revenue=-instance.total)
+    bump_version(DASHBOARD_CACHE)
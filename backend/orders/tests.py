@@ -1,3 +1,1160 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import threading
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Sum
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.timezone import localdate
+from rest_framework.test import APIClient
+
+from address.models import Address
+from carrier.models import Carrier
+from permissions.models import Permission, PermissionGroup, PermissionMenu
+from products.models import Product, ProductImage
+from wallet.models import Wallet
+from .models import (
+    Order, OrderItem, OrderDelivery, OrderShipping, OrderPayment, NotificationOutbox, OrderDailyStats,
+    OrderCodeCounter, ProductSalesDaily, TrackingSequence, EVENT_FIELDS, derived_status_expression
+)
+from . import tracking
+from .bulk import bulk_transition
+from .management.commands.dedupe_order_codes import renumber_duplicate_codes
+from .outbox import drain_outbox
+
+User = get_user_model()
+
+
+def create_user(index=1, **extra_fields):
+    return User.objects.create_user(
+        first_name='Bruce',
+        last_name='Wayne',
+        email=f'bruce{index}@wayne.com',
+        birth_date=datetime.date(1980, 2, 19),
+        cpf=f'{index:011d}',
+        phone='31999999999',
+        password='batman',
+        username=f'bruce{index}',
+        **extra_fields
+    )
+
+
+def create_product(product_id, price, quantity=100, category='Gadgets'):
+    return Product.objects.create(
+        id=product_id, title=f'Product {product_id}', description='-', category=category,
+        quantity=quantity, price_regular=price, price_sale=price, tax=Decimal('0.00')
+    )
+
+
+class OrderFixturesMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.carrier = Carrier.objects.create(name='Wayne Express', prefix='WEX')
+        cls.address = Address.objects.create(
+            user=cls.user, street='Mountain Drive', number='1007',
+            city='Gotham', state='NJ', postal_code='07001'
+        )
+        cls.wallet = Wallet.objects.create(
+            user=cls.user, name='Bruce Wayne', number='4111111111111111',
+            expiry=datetime.date(2030, 1, 1), cvc='123', brand='Visa'
+        )
+
+    def create_order(self, with_relations=True):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product_id=1, quantity=2, price=Decimal('600.00'))
+        OrderItem.objects.create(order=order, product_id=2, quantity=1, price=Decimal('50.00'))
+        if with_relations:
+            OrderDelivery.objects.create(order=order, carrier=self.carrier)
+            OrderShipping.objects.create(order=order, address=self.address)
+            OrderPayment.objects.create(order=order, wallet=self.wallet)
+        return order
+
+
+class OrderItemTotalsTests(OrderFixturesMixin, TestCase):
+    def assertTotals(self, order, sub_total, total):
+        order.refresh_from_db()
+        self.assertEqual((order.sub_total, order.total), (Decimal(sub_total), Decimal(total)))
+        revenue = sum(OrderDailyStats.objects.values_list('revenue', flat=True))
+        self.assertEqual(revenue, sum(Order.objects.values_list('total', flat=True)))
+
+    def test_item_writes_keep_persisted_totals_in_sync(self):
+        order = self.create_order(with_relations=False)
+        self.assertTotals(order, '1250.00', '1220.40')
+
+        item = order.items.get(product_id=2)
+        item.quantity = 3
+        item.save()
+        self.assertTotals(order, '1350.00', '1328.40')
+
+        order.items.get(product_id=1).delete()
+        self.assertTotals(order, '150.00', '178.20')
+
+    def test_queryset_deletes_refresh_every_touched_order(self):
+        first = self.create_order(with_relations=False)
+        second = self.create_order(with_relations=False)
+
+        OrderItem.objects.filter(product_id=1).delete()
+        self.assertTotals(first, '50.00', '70.20')
+        self.assertTotals(second, '50.00', '70.20')
+
+        OrderItem.objects.filter(order=first).delete()
+        self.assertTotals(first, '0.00', '16.20')
+        self.assertTotals(second, '50.00', '70.20')
+
+    def test_deleting_the_order_does_not_refresh_its_totals(self):
+        order = self.create_order(with_relations=False)
+        order.delete()
+        self.assertEqual(OrderDailyStats.objects.aggregate(revenue=Sum('revenue'))['revenue'], Decimal('0.00'))
+
+
+class OrderCodeTests(OrderFixturesMixin, TestCase):
+    def test_codes_are_sequential_per_user(self):
+        other = create_user(index=2)
+        codes = [Order.objects.create(user=user).code for user in (self.user, other, self.user, other, self.user)]
+        self.assertEqual(codes, ['0001', '0001', '0002', '0002', '0003'])
+        self.assertEqual(OrderCodeCounter.objects.get(user=self.user).last_code, 3)
+
+    def test_reserve_hands_out_consecutive_ranges(self):
+        self.assertEqual(list(OrderCodeCounter.reserve(self.user.id, count=3)), [1, 2, 3])
+        self.assertEqual(list(OrderCodeCounter.reserve(self.user.id)), [4])
+
+    def test_first_reservation_continues_after_existing_codes(self):
+        Order.objects.create(user=self.user, code='0007')
+        Order.objects.create(user=self.user, code='legacy')
+        self.assertEqual(Order.objects.create(user=self.user).code, '0008')
+
+    def test_counter_created_concurrently_falls_back_to_increment(self):
+        # Outra requisição criou o contador entre o UPDATE sem linha e o INSERT
+        OrderCodeCounter.objects.create(user=self.user, last_code=5)
+        self.assertEqual(OrderCodeCounter._create(self.user.id, 2), 7)
+        self.assertEqual(OrderCodeCounter.objects.get(user=self.user).last_code, 7)
+
+    def test_duplicate_codes_are_renumbered_before_the_constraint(self):
+        # Tabela no formato antigo, sem a constraint uniq_order_user_code
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE "legacy_order" (id integer PRIMARY KEY, user_id integer, code varchar(10))')
+            cursor.executemany('INSERT INTO "legacy_order" VALUES (%s, %s, %s)', [
+                (1, self.user.id, '0001'), (2, self.user.id, '0002'), (3, self.user.id, '0002'),
+                (4, self.user.id, '0002'), (5, 99, '0001'), (6, 99, '0001'),
+            ])
+        OrderCodeCounter.objects.create(user=self.user, last_code=2)
+
+        changes = renumber_duplicate_codes(table='legacy_order')
+
+        self.assertEqual(changes, [(3, '0002', '0003'), (4, '0002', '0004'), (6, '0001', '0002')])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT user_id, code FROM "legacy_order" ORDER BY id')
+            rows = cursor.fetchall()
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertEqual(OrderCodeCounter.objects.get(user=self.user).last_code, 4)
+        self.assertEqual(renumber_duplicate_codes(table='legacy_order'), [])
+        self.assertEqual(renumber_duplicate_codes(table='missing_table'), [])
+
+
+class OrderStatusTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        # Um minuto a mais a cada evento: a ordem dos created_at não depende da resolução do relógio
+        self.clock = timezone.now()
+        patcher = mock.patch('django.utils.timezone.now', side_effect=self.tick)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.order = Order.objects.create(user=self.user)
+
+    def tick(self):
+        self.clock += datetime.timedelta(minutes=1)
+        return self.clock
+
+    def assertStatus(self, expected):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, expected)
+        if expected not in ('completed', 'canceled'):
+            self.assertEqual(self.order.derive_status(), expected)
+            derived = Order.objects.annotate(derived=derived_status_expression()).get(pk=self.order.pk).derived
+            self.assertEqual(derived, expected)
+
+    def test_each_event_moves_the_status(self):
+        self.assertStatus('pending')
+        payment = OrderPayment.objects.create(order=self.order, wallet=self.wallet)
+        self.assertStatus('paid')
+        OrderDelivery.objects.create(order=self.order, carrier=self.carrier)
+        self.assertStatus('processing')
+        OrderShipping.objects.create(order=self.order, address=self.address)
+        self.assertStatus('delivered')  # envio com transportadora na entrega
+
+        self.order.status = 'completed'
+        self.order.save()
+        self.assertStatus('completed')
+        payment.canceled = True
+        payment.save()
+        self.assertStatus('completed')  # status final não é recalculado
+
+    def test_shipping_without_carrier_is_shipped(self):
+        OrderPayment.objects.create(order=self.order, wallet=self.wallet)
+        OrderShipping.objects.create(order=self.order, address=self.address)
+        self.assertStatus('shipped')
+
+    def test_canceling_cancels_every_event(self):
+        OrderPayment.objects.create(order=self.order, wallet=self.wallet)
+        OrderShipping.objects.create(order=self.order, address=self.address)
+        self.order.status = 'canceled'
+        self.order.save()
+
+        self.assertStatus('canceled')
+        self.assertIsNotNone(self.order.canceled_at)
+        self.assertEqual([getattr(self.order, field) for field in EVENT_FIELDS], [None, None, None, False])
+        self.assertFalse(self.order.orderPayments.filter(canceled=False).exists())
+
+    def test_payment_canceled_after_shipping(self):
+        OrderShipping.objects.create(order=self.order, address=self.address)
+        payment = OrderPayment.objects.create(order=self.order, wallet=self.wallet)
+        self.assertStatus('paid')
+
+        payment.canceled = True
+        payment.canceled_at = timezone.now()
+        payment.save()
+        self.assertStatus('shipped')  # volta ao evento ativo mais recente
+        self.assertIsNone(self.order.last_payment_at)
+
+    def test_sql_and_python_derivations_agree(self):
+        base = timezone.now()
+        moments = [None, base, base + datetime.timedelta(hours=1)]
+        for payment_at in moments:
+            for delivery_at in moments:
+                for shipping_at in moments:
+                    for has_carrier in (False, True):
+                        Order.objects.create(
+                            user=self.user, last_payment_at=payment_at, last_delivery_at=delivery_at,
+                            last_shipping_at=shipping_at, has_carrier=has_carrier,
+                        )
+
+        orders = Order.objects.annotate(derived=derived_status_expression())
+        for order in orders:
+            events = {field: getattr(order, field) for field in EVENT_FIELDS}
+            self.assertEqual(order.derived, order.derive_status(), events)
+        self.assertEqual(
+            {order.derived for order in orders},
+            {'pending', 'paid', 'processing', 'shipped', 'delivered'},
+        )
+
+    def test_recompute_command_repairs_stale_rows(self):
+        OrderPayment.objects.create(order=self.order, wallet=self.wallet)
+        OrderShipping.objects.create(order=self.order, address=self.address)
+        Order.objects.filter(pk=self.order.pk).update(status='pending', last_payment_at=None, last_shipping_at=None)
+
+        call_command('recompute_order_status', stdout=open('/dev/null', 'w'))
+
+        self.assertStatus('shipped')
+        self.assertIsNotNone(self.order.last_payment_at)
+
+
+def sequence_value(tracking, prefix):
+    return int(tracking[len(prefix):-1])
+
+
+class TrackingNumberTests(TestCase):
+    def setUp(self):
+        tracking._pools.clear()
+        self.addCleanup(tracking._pools.clear)
+
+    def test_format_and_luhn_check_digit(self):
+        self.assertEqual(tracking.luhn_check_digit('7992739871'), '3')
+        number = tracking.format_tracking_number('WEX', 42)
+        self.assertEqual(number, 'WEX0000000000422')
+        self.assertTrue(tracking.is_valid_tracking_number(number, 'WEX'))
+        self.assertFalse(tracking.is_valid_tracking_number('WEX0000000000423', 'WEX'))
+        self.assertFalse(tracking.is_valid_tracking_number('WEX000000000422', 'WEX'))
+        self.assertFalse(tracking.is_valid_tracking_number(number, 'UPS'))
+
+    def test_inside_a_transaction_reserves_only_what_is_needed(self):
+        wex = tracking.allocate_tracking_numbers('wex', 2)
+        ups = tracking.allocate_tracking_numbers('UPS', 1)
+        wex += tracking.allocate_tracking_numbers('WEX', 1)
+
+        self.assertEqual([sequence_value(n, 'WEX') for n in wex], [1, 2, 3])
+        self.assertEqual([sequence_value(n, 'UPS') for n in ups], [1])
+        self.assertTrue(all(tracking.is_valid_tracking_number(n, 'WEX') for n in wex))
+        self.assertEqual(TrackingSequence.objects.get(prefix='WEX').last_value, 3)
+        self.assertEqual(tracking._pools, {})  # nada fica no pool se a transação voltar
+
+
+class TrackingBlockAllocationTests(TransactionTestCase):
+    def setUp(self):
+        tracking._pools.clear()
+        self.addCleanup(tracking._pools.clear)
+
+    def test_blocks_are_reserved_per_prefix_and_served_from_memory(self):
+        wex = tracking.allocate_tracking_numbers('WEX', 3)
+        ups = tracking.allocate_tracking_numbers('UPS', 2)
+        with self.assertNumQueries(0):
+            wex += tracking.allocate_tracking_numbers('WEX', 2)
+
+        self.assertEqual([sequence_value(n, 'WEX') for n in wex], [1, 2, 3, 4, 5])
+        self.assertEqual([sequence_value(n, 'UPS') for n in ups], [1, 2])
+        self.assertEqual(
+            dict(TrackingSequence.objects.values_list('prefix', 'last_value')),
+            {'WEX': tracking.BLOCK_SIZE, 'UPS': tracking.BLOCK_SIZE},
+        )
+
+    def test_restart_skips_the_unused_block_without_repeating(self):
+        first = tracking.allocate_tracking_numbers('WEX', 2)
+        tracking._pools.clear()  # novo processo: o resto do bloco se perde
+        second = tracking.allocate_tracking_numbers('WEX', tracking.BLOCK_SIZE + 5)
+
+        values = [sequence_value(n, 'WEX') for n in first + second]
+        self.assertEqual(values[2], tracking.BLOCK_SIZE + 1)
+        self.assertEqual(len(values), len(set(values)))
+        self.assertTrue(all(tracking.is_valid_tracking_number(n, 'WEX') for n in first + second))
+        self.assertEqual(TrackingSequence.objects.get(prefix='WEX').last_value, 2 * tracking.BLOCK_SIZE + 5)
+
+
+class OrderViewSetQueryTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        return len(context), response.json()
+
+    def test_list_query_count_does_not_grow_with_orders(self):
+        for _ in range(2):
+            self.create_order()
+        queries_small, _ = self.count_list_queries()
+
+        for _ in range(8):
+            self.create_order()
+        queries_large, data = self.count_list_queries()
+
+        self.assertEqual(len(data), 10)
+        self.assertEqual(queries_small, queries_large)
+
+    def test_list_query_budget(self):
+        for _ in range(5):
+            self.create_order()
+        # orders + user (join) | items | deliveries | shippings | payments
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_returns_related_rows(self):
+        order = self.create_order()
+        data = self.client.get(f'/api/orders/{order.id}/').json()
+
+        self.assertEqual(len(data['items']), 2)
+        self.assertEqual([d['id'] for d in data['delivery']], list(order.deliveries.values_list('id', flat=True)))
+        self.assertEqual([s['id'] for s in data['shipping']], list(order.shippings.values_list('id', flat=True)))
+        self.assertEqual([p['id'] for p in data['payment']], list(order.orderPayments.values_list('id', flat=True)))
+        self.assertEqual(data['delivery'][0]['carrier'], self.carrier.id)
+        self.assertEqual(data['user']['email'], self.user.email)
+
+
+class MyOrdersPaginationTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_mine_is_scoped_and_paginated_by_cursor(self):
+        other_user = create_user(index=2)
+        Order.objects.create(user=other_user)
+        own_ids = [self.create_order(with_relations=False).id for _ in range(5)]
+
+        response = self.client.get('/api/orders/mine/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        first_page = response.json()
+        self.assertEqual([o['id'] for o in first_page['results']], own_ids[::-1][:2])
+
+        seen = [o['id'] for o in first_page['results']]
+        next_url = first_page['next']
+        while next_url:
+            page = self.client.get(next_url).json()
+            seen.extend(o['id'] for o in page['results'])
+            next_url = page['next']
+        self.assertEqual(seen, own_ids[::-1])
+
+    def test_mine_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/orders/mine/').status_code, 401)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DashboardCacheTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_dashboard_is_served_from_cache_until_orders_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_order(with_relations=False)
+
+        first = self.client.get('/api/total-orders/').json()
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/total-orders/').json()
+        self.assertEqual(first, cached)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_order(with_relations=False)
+
+        refreshed = self.client.get('/api/total-orders/').json()
+        self.assertEqual(refreshed['total_order_amount'], first['total_order_amount'] * 2)
+
+    def test_period_views_roll_over_at_midnight(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_order(with_relations=False)
+
+        today = self.client.get('/api/orders-growth-status/', {'period': 'today'}).json()
+        self.assertEqual(len(today['series']), 1)
+
+        with mock.patch('orders.views.localdate', return_value=localdate() + datetime.timedelta(days=1)):
+            tomorrow = self.client.get('/api/orders-growth-status/', {'period': 'today'}).json()
+        self.assertEqual(tomorrow['series'], [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DashboardTotalsTests(OrderFixturesMixin, TestCase):
+    """
+    Pedidos fixos (totais de calculate_totals):
+    completed 1250 → 1220.40 e 100 → 124.20 no mês; completed 200 → 232.20 no ano passado;
+    canceled 1250 → 1220.40 e pending 1250 → 1220.40 no mês.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.make_order([(2, '600.00'), (1, '50.00')], 'completed')
+        cls.make_order([(1, '100.00')], 'completed')
+        cls.make_order([(2, '600.00'), (1, '50.00')], 'canceled')
+        cls.make_order([(2, '600.00'), (1, '50.00')], 'pending')
+        old = cls.make_order([(1, '200.00')], 'completed')
+        last_year = datetime.datetime(localdate().year - 1, 6, 15, tzinfo=datetime.timezone.utc)
+        Order.objects.filter(pk=old.pk).update(created_at=last_year)
+
+    @classmethod
+    def make_order(cls, items, status):
+        order = Order.objects.create(user=cls.user)
+        for product_id, (quantity, price) in enumerate(items, start=1):
+            OrderItem.objects.create(order=order, product_id=product_id, quantity=quantity, price=Decimal(price))
+        if status != 'pending':
+            OrderDelivery.objects.create(order=order, carrier=cls.carrier)
+            OrderShipping.objects.create(order=order, address=cls.address)
+            OrderPayment.objects.create(order=order, wallet=cls.wallet)
+            order.status = status
+            order.save()
+        return order
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {key: Decimal(str(value)) if isinstance(value, float) else value for key, value in response.json().items()}
+
+    def test_total_earning_counts_completed_orders_only(self):
+        self.assertEqual(self.get('/api/total-earning/'), {
+            'subtotal': Decimal('1550.00'), 'discount_10_percent': Decimal('155.00'), 'total_earning': Decimal('1395.00'),
+        })
+
+    def test_total_orders_sums_every_status_in_the_period(self):
+        self.assertEqual(self.get('/api/total-orders/')['total_order_amount'], Decimal('4017.60'))
+        self.assertEqual(self.get('/api/total-orders/', period='month')['total_order_amount'], Decimal('3785.40'))
+        self.assertEqual(self.get('/api/total-orders/', period='year')['total_order_amount'], Decimal('3785.40'))
+
+    def test_total_income_breakdown(self):
+        self.assertEqual(self.get('/api/total-income/'), {
+            'gross_income': Decimal('1550.00'), 'total_discounts': Decimal('155.00'), 'net_income': Decimal('1395.00'),
+            'average_order_income': Decimal('465.00'), 'total_orders': 3, 'period': 'all',
+        })
+        self.assertEqual(self.get('/api/total-income/', period='month'), {
+            'gross_income': Decimal('1350.00'), 'total_discounts': Decimal('135.00'), 'net_income': Decimal('1215.00'),
+            'average_order_income': Decimal('607.50'), 'total_orders': 2, 'period': 'month',
+        })
+
+
+@override_settings(
+    TIME_ZONE='America/Sao_Paulo',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class OrderDailyStatsTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counts(self):
+        return {
+            status: count
+            for status, count in OrderDailyStats.objects.values_list('status').annotate(total=Sum('order_count'))
+            if count
+        }
+
+    def test_status_change_moves_one_count(self):
+        order = self.create_order(with_relations=False)
+        self.create_order(with_relations=False)
+        self.assertEqual(self.counts(), {'pending': 2})
+
+        order.status = 'canceled'
+        order.save()
+        self.assertEqual(self.counts(), {'pending': 1, 'canceled': 1})
+        by_status = self.client.get('/api/total-by-status/').json()
+        self.assertEqual((by_status['pending'], by_status['canceled'], by_status['paid']), (1, 1, 0))
+
+    def test_deletes_decrement_the_bucket(self):
+        first = self.create_order(with_relations=False)
+        self.create_order(with_relations=False)
+
+        first.delete()
+        self.assertEqual(self.counts(), {'pending': 1})
+        Order.objects.all().delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_buckets_follow_local_time_boundaries(self):
+        utc = datetime.timezone.utc
+        OrderDailyStats.apply_delta(datetime.datetime(2026, 3, 1, 2, 30, tzinfo=utc), 'pending', count=1)  # 28/02 23h
+        OrderDailyStats.apply_delta(datetime.datetime(2026, 3, 1, 3, 30, tzinfo=utc), 'pending', count=1)  # 01/03 00h
+        OrderDailyStats.apply_delta(datetime.datetime(2026, 1, 1, 2, 0, tzinfo=utc), 'pending', count=1)  # 31/12/2025 23h
+
+        self.assertEqual(
+            sorted(OrderDailyStats.objects.values_list('date', 'hour', 'order_count')),
+            [(datetime.date(2025, 12, 31), 23, 1), (datetime.date(2026, 2, 28), 23, 1), (datetime.date(2026, 3, 1), 0, 1)],
+        )
+
+        def growth(period):
+            data = self.client.get('/api/orders-growth-status/', {'period': period}).json()
+            return data['categories'], sum(sum(serie['data']) for serie in data['series'])
+
+        with mock.patch('orders.views.localdate', return_value=datetime.date(2026, 2, 28)):
+            self.assertEqual(growth('today'), (['23h'], 1))
+            self.assertEqual(growth('month')[1], 1)
+            self.assertEqual(growth('year')[1], 2)
+
+
+class StubAfterShipHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append((dict(self.headers), json.loads(body)))
+        self.send_response(self.server.response_status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"meta": {"code": 201}}')
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class NotificationOutboxTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), StubAfterShipHandler)
+        self.server.received = []
+        self.server.response_status = 201
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        stub_url = f'http://127.0.0.1:{self.server.server_port}/v4/trackings'
+        settings_override = override_settings(AFTERSHIP_API_URL=stub_url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def complete_order(self):
+        order = self.create_order()
+        order.status = 'completed'
+        order.save()
+        return order
+
+    def test_completing_an_order_only_writes_the_outbox(self):
+        order = self.complete_order()
+
+        self.assertEqual(self.server.received, [])
+        notification = NotificationOutbox.objects.get(order=order)
+        self.assertEqual(notification.kind, NotificationOutbox.KIND_AFTERSHIP)
+        self.assertEqual(notification.status, NotificationOutbox.STATUS_PENDING)
+
+    def test_drain_posts_to_aftership_then_sends_email(self):
+        order = self.complete_order()
+
+        stats = drain_outbox(workers=2)
+
+        self.assertEqual(stats['sent'], 2)
+        headers, body = self.server.received[0]
+        self.assertEqual(headers['Idempotency-Key'], f'{NotificationOutbox.KIND_AFTERSHIP}:{order.id}')
+        self.assertEqual(body['tracking']['tracking_number'], order.deliveries.get().tracking)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(NotificationOutbox.objects.exclude(status=NotificationOutbox.STATUS_SENT).exists())
+
+        # Um novo drain não reenvia nada
+        self.assertEqual(drain_outbox()['sent'], 0)
+        self.assertEqual(len(self.server.received), 1)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        self.complete_order()
+        self.server.response_status = 500
+
+        stats = drain_outbox()
+
+        self.assertEqual(stats['retried'], 1)
+        notification = NotificationOutbox.objects.get()
+        self.assertEqual(notification.status, NotificationOutbox.STATUS_PENDING)
+        self.assertEqual(notification.attempts, 1)
+        self.assertGreater(notification.next_attempt_at, notification.created_at)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class BulkOrderWriteTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        create_product(1, Decimal('600.00'))
+        create_product(2, Decimal('50.00'))
+        create_product(9, Decimal('10.00'))
+
+    def post_bulk(self, count):
+        payload = [
+            {'items': [
+                {'product_id': 1, 'quantity': 2},
+                {'product_id': 2, 'quantity': 1},
+            ]}
+            for _ in range(count)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/orders/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        return len(context), response.json()
+
+    def test_bulk_create_uses_constant_queries(self):
+        self.post_bulk(1)  # cria o contador de códigos e o bucket do rollup
+        queries_small, _ = self.post_bulk(2)
+        queries_large, data = self.post_bulk(20)
+
+        self.assertEqual(queries_small, queries_large)
+        self.assertLess(queries_large, 20)
+        self.assertEqual(len(data), 20)
+        self.assertEqual(len({order['code'] for order in data}), 20)
+
+        single = self.create_order(with_relations=False)
+        for order in data:
+            self.assertEqual(order['total'], float(single.total))
+            self.assertEqual(len(order['items']), 2)
+
+    def test_staff_bulk_assigns_each_order_to_its_user(self):
+        alfred, lucius = create_user(index=2), create_user(index=3)
+        Order.objects.create(user=alfred)  # alfred já tem o 0001
+        items = [{'product_id': 2, 'quantity': 1}]
+        payload = [{'user_id': alfred.id, 'items': items}, {'user_id': lucius.id, 'items': items},
+                   {'user_id': alfred.id, 'items': items}, {'items': items}]
+
+        response = self.client.post('/api/orders/bulk/', payload, format='json')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            [(order['user']['id'], order['code']) for order in response.json()],
+            [(alfred.id, '0002'), (lucius.id, '0001'), (alfred.id, '0003'), (self.user.id, '0001')],
+        )
+
+    def test_bulk_rejects_unknown_owners_and_single_create_rejects_user_id(self):
+        response = self.client.post('/api/orders/bulk/', [{'user_id': 999, 'items': [{'product_id': 2, 'quantity': 1}]}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999', str(response.json()))
+
+        response = self.client.post('/api/orders/', {'user_id': self.user.id, 'items': [{'product_id': 2, 'quantity': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('user_id', response.json())
+        self.assertFalse(Order.objects.exists())
+
+    def test_update_diffs_items_instead_of_recreating(self):
+        order = self.create_order(with_relations=False)
+        kept, removed = order.items.order_by('id')
+
+        response = self.client.patch(f'/api/orders/{order.id}/', {'items': [
+            {'product_id': kept.product_id, 'quantity': 3},
+            {'product_id': 9, 'quantity': 1},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        items = {item.product_id: item for item in order.items.all()}
+        self.assertEqual(items[kept.product_id].id, kept.id)
+        self.assertEqual(items[kept.product_id].quantity, 3)
+        self.assertNotIn(removed.product_id, items)
+        order.refresh_from_db()
+        self.assertEqual(order.sub_total, Decimal('1810.00'))
+
+    def test_new_order_without_items_has_the_empty_totals(self):
+        order = Order.objects.create(user=self.user)
+        order.refresh_from_db()
+        self.assertEqual(order.shippingFee, Decimal('15.00'))
+        self.assertEqual(order.tax, Decimal('1.20'))
+        self.assertEqual(order.total, Decimal('16.20'))
+
+        order.refresh_totals()
+        self.assertEqual(OrderDailyStats.objects.aggregate(revenue=Sum('revenue'))['revenue'], Decimal('16.20'))
+
+
+class BulkOrderTransitionTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_complete_validates_and_queues_notifications(self):
+        ready = [self.create_order() for _ in range(3)]
+        missing = self.create_order(with_relations=False)
+
+        response = self.client.post('/api/orders/transition/', {
+            'ids': [order.id for order in ready] + [missing.id, 999],
+            'action': 'complete',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(sorted(data['updated']), [order.id for order in ready])
+        self.assertEqual(set(data['rejected']), {str(missing.id), '999'})
+        self.assertEqual(Order.objects.filter(status='completed', completed_at__isnull=False).count(), 3)
+        self.assertEqual(NotificationOutbox.objects.filter(order__in=ready).count(), 3)
+
+    def test_cancel_cancels_related_rows_with_constant_queries(self):
+        orders = [self.create_order() for _ in range(5)]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/orders/transition/', {
+                'ids': [order.id for order in orders], 'action': 'cancel',
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(context), 15)
+        self.assertFalse(OrderPayment.objects.filter(canceled=False).exists())
+        self.assertFalse(OrderDelivery.objects.filter(canceled=False).exists())
+        self.assertEqual(Order.objects.filter(status='canceled').count(), 5)
+
+
+    def test_ship_survives_later_status_recomputation(self):
+        order = self.create_order()
+        unshipped = self.create_order(with_relations=False)
+        response = self.client.post('/api/orders/transition/', {
+            'ids': [order.id, unshipped.id], 'action': 'ship',
+        }, format='json')
+
+        self.assertEqual(response.json()['updated'], [order.id])
+        self.assertIn(str(unshipped.id), response.json()['rejected'])
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'delivered')  # envio mais recente com transportadora
+
+        order.deliveries.get().save()
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'delivered')
+        call_command('recompute_order_status', stdout=open('/dev/null', 'w'))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'delivered')
+
+    def test_update_skips_orders_changed_after_the_read(self):
+        order = self.create_order()
+        order.status = 'canceled'
+        order.save()
+
+        # Leitura "velha": as regras aprovam um pedido que já foi cancelado
+        with mock.patch('orders.bulk._transition_rejection', return_value=None):
+            updated, rejected = bulk_transition([order.id], 'complete')
+
+        self.assertEqual(updated, [])
+        self.assertIn(order.id, rejected)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'canceled')
+        self.assertFalse(NotificationOutbox.objects.filter(order=order).exists())
+        self.assertFalse(ProductSalesDaily.objects.exists())
+
+
+class OrderExportTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def grant_export(self):
+        group = PermissionGroup.objects.create(name='Sales')
+        menu = PermissionMenu.objects.create(name='order')
+        Permission.objects.create(group=group, menu=menu, can_read=True, can_export=True)
+        self.user.groups.add(group)
+
+    def test_export_requires_can_export(self):
+        self.assertEqual(self.client.get('/api/orders/export/').status_code, 403)
+
+    def test_streams_csv_and_ndjson_with_items(self):
+        self.grant_export()
+        orders = [self.create_order(with_relations=False) for _ in range(3)]
+
+        response = self.client.get('/api/orders/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('id,code,user_id'))
+        self.assertEqual(len(lines), 4)
+
+        response = self.client.get('/api/orders/export/?file_format=ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [order.id for order in orders])
+        self.assertEqual(rows[0]['total'], str(orders[0].total))
+        self.assertEqual(len(rows[0]['items']), 2)
+
+
+class OrderSearchTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_index_follows_related_rows_and_ranks_results(self):
+        other = create_user(index=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.create_order()
+            Order.objects.create(user=other)
+        tracking = order.deliveries.get().tracking
+
+        for query in (tracking, 'gotham', 'bruce1@wayne.com'):
+            data = self.client.get('/api/orders/search/', {'q': query}).json()
+            self.assertEqual([o['id'] for o in data], [order.id], query)
+
+        # Códigos são sequenciais por usuário: os dois pedidos são 0001
+        self.assertEqual(len(self.client.get('/api/orders/search/', {'q': order.code}).json()), 2)
+        self.assertEqual(len(self.client.get('/api/orders/search/', {'q': 'bruce2'}).json()), 1)
+
+    def test_rebuild_command_indexes_existing_orders(self):
+        order = self.create_order()
+        self.assertEqual(self.client.get('/api/orders/search/', {'q': 'gotham'}).json(), [])
+
+        call_command('rebuild_order_search', stdout=open('/dev/null', 'w'))
+
+        data = self.client.get('/api/orders/search/', {'q': 'gotham'}).json()
+        self.assertEqual([o['id'] for o in data], [order.id])
+
+    def test_search_is_staff_only(self):
+        self.client.force_authenticate(create_user(index=2, is_staff=False))
+        self.assertEqual(self.client.get('/api/orders/search/', {'q': 'bruce1'}).status_code, 403)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductExpansionTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for product_id in (1, 2):
+            product = create_product(product_id, Decimal('50.00'))
+            ProductImage.objects.create(product=product, url=f'https://cdn.wayne.com/{product_id}.png')
+
+    def test_expand_embeds_summaries_with_one_lookup_per_page(self):
+        for _ in range(5):
+            self.create_order()
+        plain_queries, _ = self.count_queries('/api/orders/')
+
+        expanded_queries, data = self.count_queries('/api/orders/?expand=product')
+        # grupos do usuário + produtos + imagens, uma vez para a página toda
+        self.assertEqual(expanded_queries, plain_queries + 3)
+        self.assertEqual(data[0]['items'][0]['product'], {
+            'id': 1, 'title': 'Product 1', 'sku': 'SKU-0001', 'image': 'https://cdn.wayne.com/1.png',
+        })
+
+        cached_queries, _ = self.count_queries('/api/orders/?expand=product')
+        self.assertEqual(cached_queries, plain_queries + 1)
+        self.assertNotIn('product', self.client.get('/api/orders/').json()[0]['items'][0])
+
+    def test_product_change_invalidates_summary(self):
+        order = self.create_order(with_relations=False)
+        self.client.get(f'/api/orders/{order.id}/?expand=product')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.get(id=1)
+            product.title = 'Batarang Mk II'
+            product.save()
+
+        data = self.client.get(f'/api/orders/{order.id}/?expand=product').json()
+        self.assertEqual(data['items'][0]['product']['title'], 'Batarang Mk II')
+
+    def test_secret_products_are_only_expanded_for_the_secret_group(self):
+        Product.objects.filter(id=1).update(is_secret=True)
+        order = self.create_order(with_relations=False)
+
+        for client in (self.client, APIClient()):
+            items = client.get(f'/api/orders/{order.id}/?expand=product').json()['items']
+            self.assertEqual({item['product_id']: item['product'] is not None for item in items}, {1: False, 2: True})
+
+        self.user.groups.add(PermissionGroup.objects.create(name='Secret'))
+        items = self.client.get(f'/api/orders/{order.id}/?expand=product').json()['items']
+        self.assertEqual(items[0]['product']['title'], 'Product 1')
+        self.assertNotIn('is_secret', items[0]['product'])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context), response.json()
+
+
+class ProductSalesTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        create_product(1, Decimal('1.00'), category='Armor')
+        create_product(2, Decimal('1.00'))
+
+    def sales(self):
+        return {
+            row['product_id']: (row['units'], row['revenue'])
+            for row in ProductSalesDaily.objects.values('product_id', 'units', 'revenue')
+        }
+
+    def test_rollup_follows_completion_and_cancellation(self):
+        order = self.create_order()
+        self.assertEqual(self.sales(), {})
+
+        order.status = 'completed'
+        order.save()
+        self.client.post('/api/orders/transition/', {
+            'ids': [self.create_order().id], 'action': 'complete',
+        }, format='json')
+        self.assertEqual(self.sales(), {1: (4, Decimal('2400.00')), 2: (2, Decimal('100.00'))})
+
+        order.status = 'canceled'
+        order.save()
+        self.assertEqual(self.sales(), {1: (2, Decimal('1200.00')), 2: (1, Decimal('50.00'))})
+
+        expected = self.sales()
+        call_command('rebuild_product_sales', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self.sales(), expected)
+
+    def test_queryset_and_cascade_deletes_leave_rollups_empty(self):
+        self.client.post('/api/orders/transition/', {
+            'ids': [self.create_order().id for _ in range(2)], 'action': 'complete',
+        }, format='json')
+        Order.objects.filter(status='completed').delete()
+        self.assertEqual(self.sales(), {1: (0, Decimal('0.00')), 2: (0, Decimal('0.00'))})
+
+        other = create_user(index=2)
+        order = Order.objects.create(user=other)
+        OrderItem.objects.create(order=order, product_id=1, quantity=1, price=Decimal('1.00'))
+        other.delete()
+
+        totals = OrderDailyStats.objects.aggregate(count=Sum('order_count'), revenue=Sum('revenue'))
+        self.assertEqual(totals, {'count': 0, 'revenue': Decimal('0.00')})
+
+    def test_top_products_and_revenue_by_category(self):
+        self.client.post('/api/orders/transition/', {
+            'ids': [self.create_order().id for _ in range(2)], 'action': 'complete',
+        }, format='json')
+
+        data = self.client.get('/api/product-sales/', {'period': 'day', 'rank': 'units', 'limit': 1}).json()
+        self.assertEqual(data['top_products'], [
+            {'product_id': 1, 'units': 4, 'revenue': 2400.0, 'title': 'Product 1'},
+        ])
+        self.assertEqual(
+            [(row['category'], row['revenue']) for row in data['by_category']],
+            [('Armor', 2400.0), ('Gadgets', 100.0)],
+        )
+
+
+class OrderTimeSeriesTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def series(self, **params):
+        response = self.client.get('/api/orders-timeseries/', {'tz': 'UTC', **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_daily_buckets_are_gap_filled(self):
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        old = self.create_order(with_relations=False)
+        Order.objects.filter(pk=old.pk).update(created_at=old.created_at - datetime.timedelta(days=2))
+        recent = self.create_order(with_relations=False)
+        recent.refresh_from_db()
+
+        window = {'start': str(today - datetime.timedelta(days=3)), 'end': str(today + datetime.timedelta(days=1))}
+        days = [str(today - datetime.timedelta(days=n)) for n in (3, 2, 1, 0)]
+
+        count = self.series(metric='count', **window)
+        self.assertEqual([b['label'] for b in count['buckets']], days)
+        self.assertEqual([b['value'] for b in count['buckets']], [0, 1, 0, 1])
+
+        revenue = self.series(metric='revenue', **window)
+        self.assertEqual(revenue['buckets'][3]['value'], float(recent.total))
+        self.assertEqual(revenue['buckets'][1]['value'], float(recent.total))
+
+        items = self.series(metric='items', status='pending,canceled', **window)
+        self.assertEqual([b['value'] for b in items['buckets']], [0, 3, 0, 3])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_implicit_end_rolls_over_with_the_current_bucket(self):
+        cache.clear()
+        moment = datetime.datetime(2026, 3, 10, 14, 30, tzinfo=datetime.timezone.utc)
+        with mock.patch('orders.views.now', return_value=moment):
+            first = self.series(granularity='hour')
+        with mock.patch('orders.views.now', return_value=moment + datetime.timedelta(minutes=20)):
+            with self.assertNumQueries(0):
+                self.assertEqual(self.series(granularity='hour'), first)
+        with mock.patch('orders.views.now', return_value=moment + datetime.timedelta(minutes=40)):
+            later = self.series(granularity='hour')
+
+        self.assertEqual(first['end'], '2026-03-10T15:00:00Z')
+        self.assertEqual(later['end'], '2026-03-10T16:00:00Z')
+        self.assertEqual(later['buckets'][-1]['label'], '2026-03-10 15:00')
+
+    def test_rejects_invalid_parameters(self):
+        for params in ({'granularity': 'minute'}, {'tz': 'Mars/Base'}, {'start': 'yesterday'},
+                       {'granularity': 'hour', 'start': '2000-01-01', 'end': '2001-01-01'}):
+            response = self.client.get('/api/orders-timeseries/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class LoadTestCommandTests(TransactionTestCase):
+    """Smoke test do loadtest_checkout: threads reais, então fora da transação do TestCase."""
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        call_command('loadtest_checkout', '--checkouts=3', '--concurrency=1', '--products=2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_step_by_step_checkouts_report_and_clean_up(self):
+        output = self.run_command('--json')
+        report = json.loads(output[output.index('{'):output.rindex('}') + 1])
+
+        self.assertEqual((report['checkouts'], report['completed']), (3, 3))
+        self.assertEqual(list(report['steps']), ['orders', 'order-delivery', 'order-shipping', 'order-payment', 'checkout'])
+        for name, step in report['steps'].items():
+            self.assertEqual((step['ok'], step['errors']), (3, 0), name)
+        self.assertGreater(report['steps']['orders']['queries_max'], 0)
+
+        self.assertIn('🧹 Load test data removed.', output)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(User.objects.exists())
+        self.assertEqual(sum(OrderDailyStats.objects.values_list('order_count', flat=True)), 0)
+
+    def test_composite_checkout_summary(self):
+        output = self.run_command('--composite')
+
+        self.assertRegex(output, r'orders/checkout\s+3\s+0')
+        self.assertIn('✅ 3/3 checkouts', output)
+        self.assertFalse(Order.objects.exists())
+
+
+class InventoryReservationTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = create_product(1, Decimal('80.00'), quantity=3)
+
+    def post_order(self, quantity):
+        return self.client.post('/api/orders/', {
+            'items': [{'product_id': 1, 'quantity': quantity}],
+        }, format='json')
+
+    def test_create_uses_server_price_and_reserves_stock(self):
+        response = self.post_order(2)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['items'][0]['price'], '80.00')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 1)
+
+        response = self.post_order(2)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.json())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_cancel_releases_stock_once(self):
+        first = Order.objects.get(id=self.post_order(2).json()['id'])
+        second_id = self.post_order(1).json()['id']
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 0)
+
+        first.status = 'canceled'
+        first.save()
+        self.client.post('/api/orders/transition/', {'ids': [first.id, second_id], 'action': 'cancel'}, format='json')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 3)
+        self.assertFalse(Order.objects.filter(stock_reserved=True).exists())
+
+
+class CheckoutTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = create_product(1, Decimal('80.00'), quantity=5)
+        create_product(2, Decimal('20.00'))
+
+    def payload(self, **overrides):
+        return {
+            'items': [{'product_id': 1, 'quantity': 2}, {'product_id': 2, 'quantity': 1}],
+            'carrier': self.carrier.id,
+            'address': self.address.id,
+            'wallet': self.wallet.id,
+            **overrides,
+        }
+
+    def post_counting_queries(self, url, payload):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response, len(context)
+
+    def step_by_step_queries(self):
+        payload = self.payload()
+        response, total = self.post_counting_queries('/api/orders/', {'items': payload['items']})
+        order_id = response.json()['id']
+        for url, data in (
+            ('/api/order-delivery/', {'order': order_id, 'carrier': self.carrier.id}),
+            ('/api/order-shipping/', {'order': order_id, 'address': self.address.id}),
+            ('/api/order-payment/', {'order': order_id, 'wallet': self.wallet.id}),
+        ):
+            total += self.post_counting_queries(url, data)[1]
+        return total
+
+    def test_checkout_matches_the_step_by_step_flow(self):
+        response, checkout_queries = self.post_counting_queries('/api/orders/checkout/', self.payload())
+        data = response.json()
+        self.assertEqual(data['status'], 'paid')
+        self.assertEqual(data['sub_total'], '180.00')
+        self.assertTrue(data['delivery'][0]['tracking'].startswith('WEX'))
+
+        order = Order.objects.get(pk=data['id'])
+        events = {field: getattr(order, field) for field in ('last_payment_at', 'last_delivery_at', 'last_shipping_at')}
+        order.refresh_related_events()
+        self.assertEqual(events, {field: getattr(order, field) for field in events})
+        self.assertEqual(order.derive_status(), 'paid')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 3)
+
+        self.assertLess(checkout_queries * 2, self.step_by_step_queries())
+
+    def test_checkout_rejects_foreign_wallet_without_side_effects(self):
+        other = create_user(index=2)
+        wallet = Wallet.objects.create(
+            user=other, name='Selina Kyle', number='4111111111111111',
+            expiry=datetime.date(2030, 1, 1), cvc='123', brand='Visa'
+        )
+        response = self.client.post('/api/orders/checkout/', self.payload(wallet=wallet.id), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('wallet', response.json())
+        self.assertFalse(Order.objects.exists())
+
+        response = self.client.post('/api/orders/checkout/', self.payload(items=[
+            {'product_id': 1, 'quantity': 6},
+        ]), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
@@ -0,0 +1,84 @@
+"""
+Alocação de números de rastreio sem consultas de unicidade.
+
+Cada prefixo de transportadora tem uma sequência no banco (TrackingSequence).
+Os números são `PREFIXO + sequência com 12 dígitos + dígito verificador Luhn`,
+então são únicos por construção. Fora de transações, cada processo reserva
+blocos da sequência de uma vez e os distribui da memória.
+"""
+import threading
+from collections import defaultdict
+
+from django.db import connection
+
+SEQUENCE_DIGITS = 12
+BLOCK_SIZE = 100
+DEFAULT_PREFIX = 'TRK'
+
+_lock = threading.Lock()
+_pools = {}  # {prefix: [próximo valor, último valor reservado]}
+
+
+def luhn_check_digit(digits):
+    total = 0
+    for index, char in enumerate(reversed(digits)):
+        value = int(char)
+        if index % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_tracking_number(tracking, prefix):
+    digits = tracking[len(prefix):]
+    if not tracking.startswith(prefix) or len(digits) != SEQUENCE_DIGITS + 1 or not digits.isdigit():
+        return False
+    return luhn_check_digit(digits[:-1]) == digits[-1]
+
+
+def format_tracking_number(prefix, value):
+    digits = f'{value:0{SEQUENCE_DIGITS}d}'
+    return f'{prefix}{digits}{luhn_check_digit(digits)}'
+
+
+def allocate_tracking_numbers(prefix, count=1):
+    """Devolve `count` números de rastreio inéditos para o prefixo."""
+    from .models import TrackingSequence
+
+    prefix = (prefix or DEFAULT_PREFIX).upper()
+
+    if connection.in_atomic_block:
+        # Dentro de uma transação a reserva pode sofrer rollback: reserva só o
+        # necessário, sem guardar sobras no pool do processo.
+        values = TrackingSequence.reserve(prefix, count)
+        return [format_tracking_number(prefix, value) for value in values]
+
+    numbers = []
+    with _lock:
+        while len(numbers) < count:
+            pool = _pools.get(prefix)
+            if not pool or pool[0] > pool[1]:
+                block = TrackingSequence.reserve(prefix, max(BLOCK_SIZE, count - len(numbers)))
+                pool = _pools[prefix] = [block.start, block.stop - 1]
+            take = min(count - len(numbers), pool[1] - pool[0] + 1)
+            numbers.extend(format_tracking_number(prefix, value) for value in range(pool[0], pool[0] + take))
+            pool[0] += take
+    return numbers
+
+
+def assign_tracking_numbers(deliveries):
+    """
+    Preenche o tracking de várias entregas de uma vez, com uma reserva por
+    prefixo de transportadora. As transportadoras já devem estar carregadas.
+    """
+    by_prefix = defaultdict(list)
+    for delivery in deliveries:
+        if not delivery.tracking and delivery.carrier_id:
+            by_prefix[delivery.carrier.prefix or DEFAULT_PREFIX].append(delivery)
+
+    for prefix, group in by_prefix.items():
+        for delivery, tracking in zip(group, allocate_tracking_numbers(prefix, len(group))):
+            delivery.tracking = tracking
+    return deliveries
@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (
     OrderViewSet,
+    OrderExportView,
     OrderDeliveryViewSet,
     OrderShippingViewSet,
     OrderPaymentViewSet,
@@ -10,7 +11,9 @@ from .views import (
     OrderTotalByPeriodView,
     TotalIncomeView,
     TotalOrdersByStatusView,
-    OrderStatusGrowthView
+    OrderStatusGrowthView,
+    ProductSalesView,
+    OrderTimeSeriesView
 )
 
 router = DefaultRouter()
@@ -20,6 +23,7 @@ router.register(r'order-shipping', OrderShippingViewSet, basename='order-shippin
 router.register(r'order-payment', OrderPaymentViewSet, basename='order-payment')
 
 urlpatterns = [
+    path('orders/export/', OrderExportView.as_view(), name='orders-export'),
     path('', include(router.urls)),
 
     # ✅ Dashboard
@@ -28,4 +32,6 @@ urlpatterns = [
     path('total-income/', TotalIncomeView.as_view(), name='total-income'),
     path('total-by-status/', TotalOrdersByStatusView.as_view(), name='orders-by-status'),
     path('orders-growth-status/', OrderStatusGrowthView.as_view(), name='orders-growth-status'),
+    path('product-sales/', ProductSalesView.as_view(), name='product-sales'),
+    path('orders-timeseries/', OrderTimeSeriesView.as_view(), name='orders-timeseries'),
 ]
@@ -1,21 +1,46 @@
 import calendar
 import logging
+from datetime import datetime, timedelta
 from collections import defaultdict
 from decimal import Decimal
 
-from django.db.models import Count, Sum, F
-from django.db.models.functions import TruncHour, TruncWeek, TruncMonth
-from django.utils.timezone import now
+from django.db.models import Count, Sum, F, Value, DecimalField
+from django.db.models.functions import Coalesce, TruncWeek, TruncMonth
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_aware, localdate, make_aware, now
 
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
-from rest_framework.permissions import SAFE_METHODS, BasePermission
+from rest_framework.permissions import SAFE_METHODS, BasePermission, IsAdminUser, IsAuthenticated
 from rest_framework.generics import RetrieveAPIView
 from rest_framework.response import Response
 
-from .models import Order, OrderDelivery, OrderShipping, OrderPayment, OrderItem
+from products.models import Product
+
+from wayne_backend.core.cache import cache_response
+from wayne_backend.core.exports import StreamingExportView
+from wayne_backend.core.timeseries import (
+    GRANULARITIES,
+    TimeSeriesError,
+    bucket_boundaries,
+    bucket_label,
+    floor_to_bucket,
+    gap_filled_series,
+    period_range,
+    resolve_timezone,
+)
+
+from .models import (
+    DASHBOARD_CACHE, Order, OrderDailyStats, OrderDelivery, OrderShipping, OrderPayment, OrderItem, ProductSalesDaily
+)
+from .pagination import OrderCursorPagination
+from .search import search_order_ids
+from .bulk import bulk_transition
 from .serializers import (
+    CheckoutSerializer,
     OrderSerializer,
+    OrderTransitionSerializer,
     OrderDeliverySerializer,
     OrderShippingSerializer,
     OrderPaymentSerializer
@@ -23,6 +48,26 @@ from .serializers import (
 
 logger = logging.getLogger(__name__)
 
+def sum_of(field):
+    """Soma de um total persistido do Order, com zero quando não há linhas."""
+    return Coalesce(Sum(field), Value(Decimal('0.00')), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+def local_day(view, request):
+    """Períodos relativos a hoje (today/month/year) mudam na virada do dia: a data local entra na chave."""
+    return localdate().isoformat()
+
+def current_bucket(view, request):
+    """Sem ?end a série termina em now(): o bucket atual (já arredondado) entra na chave."""
+    params = request.query_params
+    granularity = params.get('granularity', 'day').lower()
+    if 'end' in params or granularity not in GRANULARITIES:
+        return ''
+    try:
+        tz = resolve_timezone(params.get('tz'))
+    except TimeSeriesError:
+        return ''
+    return floor_to_bucket(now(), granularity, tz).isoformat()
+
 class MixedPermission(BasePermission):
     """
     Permite acesso irrestrito a métodos seguros (GET, HEAD, OPTIONS),
@@ -39,7 +84,7 @@ class MixedPermission(BasePermission):
         return request.user and request.user.is_staff
 
 class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all().order_by('-id')
+    queryset = Order.objects.with_details().order_by('-id')
     serializer_class = OrderSerializer
     permission_classes = [MixedPermission]
 
@@ -48,11 +93,138 @@ class OrderViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='mine',
+        permission_classes=[IsAuthenticated],
+        pagination_class=OrderCursorPagination,
+    )
+    def mine(self, request):
+        """
+        Histórico de pedidos do usuário autenticado, paginado por cursor
+        sobre o índice (user, -id).
+        """
+        queryset = Order.objects.with_details().filter(user=request.user)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='search', permission_classes=[IsAdminUser])
+    def search(self, request):
+        """
+        Busca ranqueada por código, cliente (nome/e-mail), rastreio e cidade
+        de envio: GET orders/search/?q=...&limit=...
+        Varre os pedidos de todos os clientes, então é só para a equipe (staff).
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({"error": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = search_order_ids(text, limit=limit)
+        orders = Order.objects.with_details().in_bulk(ids)
+        serializer = self.get_serializer([orders[i] for i in ids if i in orders], many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='checkout', permission_classes=[IsAuthenticated])
+    def checkout(self, request):
+        """
+        Cria pedido, itens, entrega, envio e pagamento em uma única transação:
+        {"items": [...], "carrier": id, "address": id, "wallet": id, "speed": "standard"}.
+        """
+        serializer = CheckoutSerializer(data=request.data, context=self.get_serializer_context())
+        if not serializer.is_valid():
+            logger.warning("❌ Checkout serializer errors: %s", serializer.errors)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        order = serializer.save()
+        logger.info("✅ Checkout completed: order %s", order.id)
+
+        order = Order.objects.with_details().get(pk=order.pk)
+        return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Cria vários pedidos (lista de pedidos com seus itens) em uma única
+        transação, com INSERTs em lote de pedidos e itens. Cada pedido pode
+        indicar o dono em `user_id` (importação da equipe); sem ele o pedido
+        fica com quem envia: [{"user_id": 7, "items": [...]}, ...].
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+
+        if not serializer.is_valid():
+            logger.warning("❌ Bulk order serializer errors: %s", serializer.errors)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        orders = serializer.save()
+        logger.info("✅ Bulk created %s orders", len(orders))
+
+        created = Order.objects.with_details().filter(id__in=[order.id for order in orders]).order_by('id')
+        return Response(self.get_serializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='transition')
+    def transition(self, request):
+        """
+        Cancela, conclui ou marca como enviados vários pedidos de uma vez:
+        {"ids": [...], "action": "cancel" | "complete" | "ship"}.
+        """
+        serializer = OrderTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        action_name = serializer.validated_data['action']
+        updated, rejected = bulk_transition(serializer.validated_data['ids'], action_name)
+        logger.info("✅ Bulk %s: %s updated, %s rejected", action_name, len(updated), len(rejected))
+
+        return Response({
+            "action": action_name,
+            "updated": updated,
+            "rejected": rejected,
+        }, status=status.HTTP_200_OK)
+
+class OrderExportView(StreamingExportView):
+    """Exporta os pedidos com totais e itens (CSV ou NDJSON, em streaming)."""
+    export_menu = 'order'
+    filename = 'orders'
+    columns = [
+        'id', 'code', 'user_id', 'user_email', 'status', 'created_at', 'completed_at', 'canceled_at',
+        'sub_total', 'discount', 'shippingFee', 'tax', 'total', 'items',
+    ]
+    # iterator(chunk_size) faz o prefetch dos itens a cada chunk
+    queryset = Order.objects.select_related('user').prefetch_related('items').order_by('id')
+
+    def to_row(self, order):
+        return {
+            'id': order.id,
+            'code': order.code,
+            'user_id': order.user_id,
+            'user_email': order.user.email,
+            'status': order.status,
+            'created_at': order.created_at,
+            'completed_at': order.completed_at,
+            'canceled_at': order.canceled_at,
+            'sub_total': order.sub_total,
+            'discount': order.discount,
+            'shippingFee': order.shippingFee,
+            'tax': order.tax,
+            'total': order.total,
+            'items': [
+                {'product_id': item.product_id, 'quantity': item.quantity, 'price': item.price}
+                for item in order.items.all()
+            ],
+        }
+
 class OrderDetailView(RetrieveAPIView):
     """
     Visualização de detalhe de um único pedido (por ID).
     """
-    queryset = Order.objects.all()
+    queryset = Order.objects.with_details()
     serializer_class = OrderSerializer
     permission_classes = [MixedPermission]
     lookup_field = 'id'
@@ -177,10 +349,12 @@ class TotalEarningView(APIView):
     """
     permission_classes = [MixedPermission]
 
+    @cache_response(DASHBOARD_CACHE)
     def get(self, request):
         try:
-            orders = Order.objects.filter(status='completed')
-            total_subtotal = sum((order.sub_total for order in orders), Decimal('0.00'))
+            total_subtotal = Order.objects.filter(status='completed').aggregate(
+                subtotal=sum_of('sub_total')
+            )['subtotal']
             total_discount = total_subtotal * Decimal('0.10')
             total_earning = total_subtotal - total_discount
 
@@ -207,22 +381,18 @@ class OrderTotalByPeriodView(APIView):
     """
     permission_classes = [MixedPermission]
 
+    @cache_response(DASHBOARD_CACHE, vary=local_day)
     def get(self, request):
         try:
-            today = now()
             period = request.query_params.get('period', 'all').lower()
 
             orders = Order.objects.all()
 
-            if period == 'month':
-                orders = orders.filter(
-                    created_at__year=today.year,
-                    created_at__month=today.month
-                )
-            elif period == 'year':
-                orders = orders.filter(created_at__year=today.year)
+            window = period_range(period)
+            if window:
+                orders = orders.filter(created_at__gte=window[0], created_at__lt=window[1])
 
-            total = sum((order.total for order in orders), Decimal('0.00'))
+            total = orders.aggregate(total=sum_of('total'))['total']
 
             logger.info(f"📦 Total de ordens para período '{period}': R$ {total}")
             return Response({
@@ -244,21 +414,20 @@ class TotalIncomeView(APIView):
     """
     permission_classes = [MixedPermission]
 
+    @cache_response(DASHBOARD_CACHE, vary=local_day)
     def get(self, request):
         try:
             period = request.query_params.get('period', 'all').lower()
-            today = now()
 
             orders = Order.objects.filter(status='completed')
 
-            if period == 'month':
-                orders = orders.filter(created_at__year=today.year, created_at__month=today.month)
-            elif period == 'year':
-                orders = orders.filter(created_at__year=today.year)
-
-            total_orders = orders.count()
+            window = period_range(period)
+            if window:
+                orders = orders.filter(created_at__gte=window[0], created_at__lt=window[1])
 
-            gross_income = sum((order.sub_total for order in orders), Decimal('0.00'))
+            aggregates = orders.aggregate(total_orders=Count('id'), gross_income=sum_of('sub_total'))
+            total_orders = aggregates['total_orders']
+            gross_income = aggregates['gross_income']
             total_discounts = gross_income * Decimal('0.10')  # 🔁 fixo 10%
             net_income = gross_income - total_discounts
             average_order_income = net_income / total_orders if total_orders > 0 else Decimal('0.00')
@@ -285,9 +454,10 @@ class TotalOrdersByStatusView(APIView):
     """
     permission_classes = [MixedPermission]
 
+    @cache_response(DASHBOARD_CACHE)
     def get(self, request):
         try:
-            queryset = Order.objects.values('status').annotate(count=Count('id'))
+            queryset = OrderDailyStats.objects.values('status').annotate(count=Sum('order_count'))
             result = {entry['status']: entry['count'] for entry in queryset}
 
             # Assegura todos os status mesmo que nenhum tenha count
@@ -308,23 +478,31 @@ class OrderStatusGrowthView(APIView):
     """
     permission_classes = [MixedPermission]
 
+    @cache_response(DASHBOARD_CACHE, vary=local_day)
     def get(self, request):
         try:
             period = request.query_params.get('period', 'month').lower()
-            today = now()
-            queryset = Order.objects.all()
+            today = localdate()
+            queryset = OrderDailyStats.objects.all()
 
             if period == 'today':
-                queryset = queryset.filter(created_at__date=today.date())
-                trunc_fn = TruncHour('created_at')
+                queryset = queryset.filter(date=today)
+                group_expr = F('hour')
             elif period == 'month':
-                queryset = queryset.filter(created_at__year=today.year, created_at__month=today.month)
-                trunc_fn = TruncWeek('created_at')
+                first_day = today.replace(day=1)
+                last_day = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+                queryset = queryset.filter(date__range=(first_day, last_day))
+                group_expr = TruncWeek('date')
             else:
-                queryset = queryset.filter(created_at__year=today.year)
-                trunc_fn = TruncMonth('created_at')
-
-            annotated = queryset.annotate(group=trunc_fn).values('group', 'status').annotate(count=Count('id')).order_by('group')
+                queryset = queryset.filter(date__range=(today.replace(month=1, day=1), today.replace(month=12, day=31)))
+                group_expr = TruncMonth('date')
+
+            annotated = (
+                queryset.annotate(group=group_expr)
+                .values('group', 'status')
+                .annotate(count=Sum('order_count'))
+                .order_by('group')
+            )
 
             group_keys = []
             status_map = defaultdict(lambda: defaultdict(int))  # {status: {group: count}}
@@ -341,7 +519,7 @@ class OrderStatusGrowthView(APIView):
             categories = []
             for g in group_keys:
                 if period == 'today':
-                    label = g.strftime('%Hh')
+                    label = f'{g:02d}h'
                 elif period == 'month':
                     week = g.isocalendar()[1] - today.isocalendar()[1] + 1
                     label = f"Week {week if week > 0 else 1}"
@@ -361,4 +539,128 @@ class OrderStatusGrowthView(APIView):
 
         except Exception as e:
             logger.exception("❌ Failed to generate OrderStatusGrowthView")
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ProductSalesView(APIView):
+    """
+    Produtos mais vendidos e receita por categoria, lidos do ProductSalesDaily.
+    Parâmetros: period=day|month|year (janela que contém `date`, hoje por padrão),
+    rank=revenue|units e limit (top N, máx. 100).
+    """
+    permission_classes = [MixedPermission]
+
+    @cache_response(DASHBOARD_CACHE, vary=local_day)
+    def get(self, request):
+        period = request.query_params.get('period', 'month').lower()
+        rank = request.query_params.get('rank', 'revenue').lower()
+        if period not in ('day', 'month', 'year') or rank not in ('revenue', 'units'):
+            return Response({"error": "Invalid period or rank."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+            day = parse_date(request.query_params['date']) if 'date' in request.query_params else localdate()
+        except ValueError:
+            day = None
+        if day is None:
+            return Response({"error": "Invalid date or limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if period == 'day':
+            window = (day, day)
+        elif period == 'month':
+            window = (day.replace(day=1), day.replace(day=calendar.monthrange(day.year, day.month)[1]))
+        else:
+            window = (day.replace(month=1, day=1), day.replace(month=12, day=31))
+
+        queryset = ProductSalesDaily.objects.filter(date__range=window)
+        totals = {'units': Sum('units'), 'revenue': Sum('revenue')}
+
+        top = list(
+            queryset.values('product_id').annotate(**totals).order_by(f'-{rank}', 'product_id')[:limit]
+        )
+        titles = dict(Product.objects.filter(id__in=[row['product_id'] for row in top]).values_list('id', 'title'))
+        for row in top:
+            row['title'] = titles.get(row['product_id'])
+
+        by_category = list(queryset.values('category').annotate(**totals).order_by('-revenue', 'category'))
+
+        return Response({
+            "period": period,
+            "start": window[0],
+            "end": window[1],
+            "top_products": top,
+            "by_category": by_category,
+        }, status=status.HTTP_200_OK)
+
+
+class OrderTimeSeriesView(APIView):
+    """
+    Série temporal de pedidos com buckets vazios preenchidos com zero.
+    Parâmetros: metric=count|revenue|items, granularity=hour|day|week|month,
+    start/end (data ou data-hora ISO, end exclusivo), tz (IANA, padrão TIME_ZONE)
+    e status (lista separada por vírgula, opcional).
+    """
+    permission_classes = [MixedPermission]
+
+    METRICS = ('count', 'revenue', 'items')
+    DEFAULT_SPAN = {
+        'hour': timedelta(hours=24),
+        'day': timedelta(days=30),
+        'week': timedelta(weeks=12),
+        'month': timedelta(days=365),
+    }
+
+    def parse_instant(self, value, tz, name):
+        if value is None:
+            return None
+        instant = parse_datetime(value)
+        if instant is None:
+            day = parse_date(value)
+            if day is None:
+                raise TimeSeriesError(f"Invalid {name}: use an ISO date or datetime.")
+            instant = datetime.combine(day, datetime.min.time())
+        return instant if is_aware(instant) else make_aware(instant, tz)
+
+    @cache_response(DASHBOARD_CACHE, vary=current_bucket)
+    def get(self, request):
+        params = request.query_params
+        metric = params.get('metric', 'count').lower()
+        granularity = params.get('granularity', 'day').lower()
+        if metric not in self.METRICS:
+            return Response({"error": f"Invalid metric. Use one of: {', '.join(self.METRICS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            tz = resolve_timezone(params.get('tz'))
+            end = self.parse_instant(params.get('end'), tz, 'end') or now()
+            start = self.parse_instant(params.get('start'), tz, 'start') or end - self.DEFAULT_SPAN.get(granularity, timedelta(days=30))
+            buckets = bucket_boundaries(start, end, granularity, tz)
+        except (TimeSeriesError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        statuses = [s for s in params.get('status', '').split(',') if s]
+        if metric == 'items':
+            queryset = OrderItem.objects.all()
+            time_field, value, aggregate = 'order__created_at', 'quantity', 'SUM'
+            if statuses:
+                queryset = queryset.filter(order__status__in=statuses)
+        else:
+            queryset = Order.objects.all()
+            time_field = 'created_at'
+            value, aggregate = ('total', 'SUM') if metric == 'revenue' else (None, 'COUNT')
+            if statuses:
+                queryset = queryset.filter(status__in=statuses)
+
+        values = gap_filled_series(queryset, time_field, buckets, value=value, aggregate=aggregate)
+        if metric == 'revenue':
+            values = [Decimal(str(v)).quantize(Decimal('0.01')) for v in values]
+
+        return Response({
+            "metric": metric,
+            "granularity": granularity,
+            "timezone": str(tz),
+            "start": buckets[0][0],
+            "end": buckets[-1][1],
+            "buckets": [
+                {"start": bucket_start, "label": bucket_label(bucket_start, granularity), "value": v}
+                for (bucket_start, _), v in zip(buckets, values)
+            ],
+        }, status=status.HTTP_200_OK)
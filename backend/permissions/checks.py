@@ -0,0 +1,11 @@
+from rest_framework.permissions import BasePermission
+
+from .principal import get_principal
+
+
+class CanExport(BasePermission):
+    """Exige can_export no menu definido em `view.export_menu`."""
+    message = "You do not have permission to export this data."
+
+    def has_permission(self, request, view):
+        return get_principal(request).has_menu_permission(view.export_menu, 'can_export')
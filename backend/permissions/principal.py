@@ -0,0 +1,67 @@
+"""
+Contexto de permissões do usuário da requisição (principal).
+
+Carregado uma vez por requisição (duas queries: grupos e permissões dos grupos
+ativos) e guardado no HttpRequest, então viewsets, permissions e serializers
+consultam grupos, menus e flags sem voltar ao banco.
+"""
+from .models import Permission
+
+PERMISSION_FLAGS = (
+    'can_create', 'can_read', 'can_update', 'can_delete', 'can_secret',
+    'can_export', 'can_import', 'can_download', 'can_upload',
+)
+SECRET_GROUP = 'Secret'
+
+
+class Principal:
+    def __init__(self, user):
+        self.user = user
+        self.is_authenticated = bool(user and user.is_authenticated)
+        self.is_staff = self.is_authenticated and user.is_staff
+        self.is_superuser = self.is_authenticated and user.is_superuser
+        self.groups = frozenset()
+        self.menus = {}
+
+        if self.is_authenticated:
+            self._load()
+
+    def _load(self):
+        groups = list(self.user.groups.values_list('id', 'name', 'is_active'))
+        self.groups = frozenset(name for _, name, _ in groups)
+        active_ids = [group_id for group_id, _, is_active in groups if is_active]
+        if not active_ids:
+            return
+
+        # Merge por menu: basta um grupo conceder a flag (mesma regra do my_permissions)
+        rows = Permission.objects.filter(group_id__in=active_ids, menu__is_active=True).values('menu__name', *PERMISSION_FLAGS)
+        for row in rows:
+            merged = self.menus.setdefault(row['menu__name'], dict.fromkeys(PERMISSION_FLAGS, False))
+            for flag in PERMISSION_FLAGS:
+                merged[flag] |= row[flag]
+
+    def in_group(self, name):
+        return name in self.groups
+
+    def has_menu_permission(self, menu_name, flag):
+        if self.is_superuser:
+            return True
+        return self.menus.get(menu_name, {}).get(flag, False)
+
+    @property
+    def can_view_secret(self):
+        return self.in_group(SECRET_GROUP)
+
+
+def get_principal(request):
+    """Principal da requisição (DRF Request ou HttpRequest), montado na primeira chamada."""
+    if request is None:
+        return Principal(None)
+    # Guarda no HttpRequest: o DRF Request e o Django compartilham o mesmo objeto
+    http_request = getattr(request, '_request', request)
+    principal = getattr(http_request, '_principal', None)
+    user = getattr(request, 'user', None)
+    if principal is None or principal.user is not user:
+        principal = Principal(user)
+        http_request._principal = principal
+    return principal
@@ -0,0 +1,54 @@
+"""
+Facetas do catálogo (categorias, faixas de preço e de avaliação) calculadas
+em uma única query agrupada por category_slug, com contagens condicionais
+para cada faixa. As faixas de cada categoria são somadas em Python.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Min, Q
+
+# (mínimo, máximo exclusivo) do preço de venda; None = sem limite
+PRICE_BUCKETS = [
+    (Decimal('0'), Decimal('50')),
+    (Decimal('50'), Decimal('100')),
+    (Decimal('100'), Decimal('250')),
+    (Decimal('250'), Decimal('500')),
+    (Decimal('500'), Decimal('1000')),
+    (Decimal('1000'), None),
+]
+# Avaliação mínima: "4 ou mais", "3 ou mais"...
+RATING_THRESHOLDS = [4, 3, 2, 1]
+
+
+def _price_condition(low, high):
+    condition = Q(price_sale__gte=low)
+    if high is not None:
+        condition &= Q(price_sale__lt=high)
+    return condition
+
+
+def facet_counts(queryset):
+    """Contagens por categoria, faixa de preço e avaliação mínima do queryset já filtrado."""
+    aggregates = {'count': Count('id'), 'name': Min('category')}
+    for index, (low, high) in enumerate(PRICE_BUCKETS):
+        aggregates[f'price_{index}'] = Count('id', filter=_price_condition(low, high))
+    for threshold in RATING_THRESHOLDS:
+        aggregates[f'rating_{threshold}'] = Count('id', filter=Q(rating_rate__gte=threshold))
+
+    rows = list(queryset.order_by().values('category_slug').annotate(**aggregates).order_by('-count', 'category_slug'))
+
+    return {
+        'total': sum(row['count'] for row in rows),
+        'categories': [
+            {'slug': row['category_slug'], 'name': row['name'], 'count': row['count']}
+            for row in rows
+        ],
+        'price': [
+            {'min': low, 'max': high, 'count': sum(row[f'price_{index}'] for row in rows)}
+            for index, (low, high) in enumerate(PRICE_BUCKETS)
+        ],
+        'rating': [
+            {'min': threshold, 'count': sum(row[f'rating_{threshold}'] for row in rows)}
+            for threshold in RATING_THRESHOLDS
+        ],
+    }
@@ -0,0 +1,29 @@
+import django_filters
+from django.utils.text import slugify
+
+from .models import Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    """
+    Filtros do catálogo. Cada filtro bate com um dos índices compostos de
+    Product (categoria, preço de venda, ativo, estoque e avaliação).
+    """
+    category = django_filters.CharFilter(method='filter_category')
+    min_price = django_filters.NumberFilter(field_name='price_sale', lookup_expr='gte')
+    # Intervalo [min_price, max_price), igual às faixas de preço das facetas
+    max_price = django_filters.NumberFilter(field_name='price_sale', lookup_expr='lt')
+    is_active = django_filters.BooleanFilter(field_name='is_active')
+    in_stock = django_filters.BooleanFilter(method='filter_in_stock')
+    min_rating = django_filters.NumberFilter(field_name='rating_rate', lookup_expr='gte')
+
+    class Meta:
+        model = Product
+        fields = ['category', 'min_price', 'max_price', 'is_active', 'in_stock', 'min_rating']
+
+    def filter_category(self, queryset, name, value):
+        # Aceita o nome ou o slug: ambos viram o slug indexado
+        return queryset.filter(category_slug=slugify(value))
+
+    def filter_in_stock(self, queryset, name, value):
+        return queryset.filter(quantity__gt=0) if value else queryset.filter(quantity=0)
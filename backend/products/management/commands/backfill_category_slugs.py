@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import slugify
+
+from products.models import CATALOG_CACHE, Product
+from wayne_backend.core.cache import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Fills Product.category_slug from category (one UPDATE per distinct category)'
+
+    def handle(self, *args, **options):
+        updated = 0
+        with transaction.atomic():
+            for category in Product.objects.order_by().values_list('category', flat=True).distinct():
+                updated += Product.objects.filter(category=category).exclude(
+                    category_slug=slugify(category)
+                ).update(category_slug=slugify(category))
+            bump_version(CATALOG_CACHE)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Category slugs backfilled: {updated} products updated."))
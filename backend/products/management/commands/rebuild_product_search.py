@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from products.search import rebuild_product_search
+from wayne_backend.core.fts import fts_available
+
+
+class Command(BaseCommand):
+    help = 'Drops and rebuilds the FTS5 product search index (title, description, category, SKU, code)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Number of products indexed per transaction')
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING("⚠️ FTS5 search index is only available on SQLite; nothing to do."))
+            return
+
+        total = rebuild_product_search(chunk_size=max(1, options['chunk_size']))
+        self.stdout.write(self.style.SUCCESS(f"✅ Product search index rebuilt: {total} products."))
@@ -1,11 +1,15 @@
 from django.db import models
 from django.utils.deconstruct import deconstructible
 from django.core.validators import FileExtensionValidator
+from django.utils.text import slugify
 import os
 import uuid
 import random
 import string
 
+# Namespace do cache das respostas do catálogo (ver core.cache.cache_response)
+CATALOG_CACHE = 'products:catalog'
+
 # ✅ Caminho customizado para upload de imagens de produtos
 @deconstructible
 class ProductImageUploadPath:
@@ -25,6 +29,8 @@ class Product(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     category = models.CharField(max_length=100)
+    # Forma normalizada e indexada da categoria (filtros e facetas), mantida no save()
+    category_slug = models.SlugField(max_length=120, blank=True, editable=False, db_index=False)
     code = models.CharField(max_length=50, unique=True, blank=True)
     sku = models.CharField(max_length=50, unique=True, blank=True)
     quantity = models.PositiveIntegerField()
@@ -43,6 +49,10 @@ class Product(models.Model):
 
     def save(self, *args, **kwargs):
         is_new = self._state.adding
+        self.category_slug = slugify(self.category)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'category' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'category_slug'}
         super().save(*args, **kwargs)
 
         if is_new:
@@ -67,6 +77,12 @@ class Product(models.Model):
             models.Index(fields=["title"], name="product_title_idx"),
             models.Index(fields=["sku"], name="product_sku_idx"),
             models.Index(fields=["code"], name="product_code_idx"),
+            # Catálogo: visibilidade + filtro + ordenação/paginação por id
+            models.Index(fields=["is_secret", "category_slug", "id"], name="product_secret_cat_id_idx"),
+            models.Index(fields=["category_slug", "price_sale"], name="product_cat_price_idx"),
+            models.Index(fields=["is_active", "price_sale"], name="product_active_price_idx"),
+            models.Index(fields=["is_active", "rating_rate"], name="product_active_rating_idx"),
+            models.Index(fields=["quantity"], name="product_quantity_idx"),
         ]
 
 ALLOWED_IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'webp', 'gif', 'bmp', 'tiff', 'svg']
@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) do catálogo: cada página é um
+    `WHERE <filtros> AND id > cursor ORDER BY id LIMIT n`, com o mesmo custo
+    em qualquer página e em qualquer tamanho de tabela.
+
+    A listagem sempre vem paginada ({next, previous, results}); quem precisa
+    do catálogo inteiro segue o `next`.
+    """
+    ordering = 'id'
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        # price_sale e rating_rate repetem valores: o id desempata e mantém a ordem estável entre páginas
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
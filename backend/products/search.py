@@ -0,0 +1,117 @@
+"""
+Índice de busca de produtos (FTS5): título, descrição, categoria, SKU e código.
+O rowid do índice é o id do produto. Visibilidade (is_active/is_secret) não
+entra no índice: é filtrada na própria busca, com JOIN na tabela de produtos.
+"""
+import threading
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from wayne_backend.core.fts import (
+    create_fts_table,
+    delete_rows,
+    drop_fts_table,
+    fts_available,
+    fts_search,
+    replace_rows,
+)
+
+PRODUCT_SEARCH_TABLE = 'productSearch'
+PRODUCT_SEARCH_COLUMNS = ['title', 'description', 'category', 'sku', 'code']
+# Pesos do bm25, na ordem das colunas: título, SKU e código valem mais que a descrição
+PRODUCT_SEARCH_WEIGHTS = [10.0, 1.0, 3.0, 8.0, 8.0]
+
+_pending = threading.local()
+
+
+def ensure_product_search_table(**kwargs):
+    create_fts_table(PRODUCT_SEARCH_TABLE, PRODUCT_SEARCH_COLUMNS)
+
+
+def build_documents(product_ids):
+    from .models import Product
+
+    return list(Product.objects.filter(id__in=product_ids).values_list('id', *PRODUCT_SEARCH_COLUMNS))
+
+
+def index_products(product_ids):
+    """(Re)indexa os produtos; ids que não existem mais saem do índice."""
+    product_ids = set(product_ids)
+    if not product_ids or not fts_available():
+        return
+    rows = build_documents(product_ids)
+    delete_rows(PRODUCT_SEARCH_TABLE, product_ids - {row[0] for row in rows})
+    replace_rows(PRODUCT_SEARCH_TABLE, PRODUCT_SEARCH_COLUMNS, rows)
+
+
+def _flush_pending():
+    product_ids = getattr(_pending, 'product_ids', set())
+    _pending.product_ids = set()
+    index_products(product_ids)
+
+
+def schedule_reindex(product_ids):
+    """Agenda a reindexação para depois do commit (vários saves viram uma só)."""
+    if not fts_available():
+        return
+    if not hasattr(_pending, 'product_ids'):
+        _pending.product_ids = set()
+    _pending.product_ids.update(product_ids)
+    transaction.on_commit(_flush_pending)
+
+
+def rebuild_product_search(chunk_size=2000):
+    """Recria o índice do zero. Devolve o número de produtos indexados."""
+    from .models import Product
+
+    if not fts_available():
+        return 0
+    drop_fts_table(PRODUCT_SEARCH_TABLE)
+    ensure_product_search_table()
+
+    total, last_id = 0, 0
+    while True:
+        ids = list(Product.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        with transaction.atomic():
+            replace_rows(PRODUCT_SEARCH_TABLE, PRODUCT_SEARCH_COLUMNS, build_documents(ids))
+        total += len(ids)
+        last_id = ids[-1]
+
+
+def search_product_ids(text, include_secret=False, limit=20, prefix=False):
+    """
+    Ids dos produtos ativos que casam com `text`, do mais para o menos relevante.
+    `prefix=True` casa o início de cada termo (autocomplete).
+    """
+    from .models import Product
+
+    if fts_available():
+        qn = connection.ops.quote_name
+        products = qn(Product._meta.db_table)
+        where = f'{products}.{qn("is_active")} = %s'
+        params = [True]
+        if not include_secret:
+            where += f' AND {products}.{qn("is_secret")} = %s'
+            params.append(False)
+        rows = fts_search(
+            PRODUCT_SEARCH_TABLE, text, PRODUCT_SEARCH_WEIGHTS, limit=limit, prefix=prefix,
+            join=f'JOIN {products} ON {products}.{qn("id")} = "{PRODUCT_SEARCH_TABLE}".rowid',
+            where=where, params=params,
+        )
+        return [rowid for rowid, _ in rows]
+
+    # Outros bancos: filtro simples sobre título, SKU e código
+    text = (text or '').strip()
+    if not text:
+        return []
+    lookup = 'istartswith' if prefix else 'icontains'
+    queryset = Product.objects.filter(
+        Q(**{f'title__{lookup}': text}) | Q(sku__iexact=text) | Q(code__iexact=text),
+        is_active=True,
+    )
+    if not include_secret:
+        queryset = queryset.filter(is_secret=False)
+    return list(queryset.order_by('id').values_list('id', flat=True)[:limit])
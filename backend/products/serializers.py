@@ -18,7 +18,7 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'title', 'description', 'category', 'code', 'sku', 'quantity',
+            'id', 'title', 'description', 'category', 'category_slug', 'code', 'sku', 'quantity',
             'price_regular', 'price_sale', 'tax', 'price',
             'rating', 'images', 'is_active', 'is_secret'
         ]
@@ -36,21 +36,6 @@ class ProductSerializer(serializers.ModelSerializer):
             "count": obj.rating_count
         }
 
-    def to_representation(self, instance):
-        # Get the user from the request
-        request = self.context.get('request')
-        user = request.user if request and hasattr(request, 'user') else None
-
-        # Check if the product is secret and if the user has permission to view it
-        if instance.is_secret:
-            # If user is not authenticated or doesn't have the Secret group, exclude this product
-            if not user or not user.is_authenticated or not user.groups.filter(name='Secret').exists():
-                return None
-
-        # If not secret or user has permission, proceed with normal serialization
-        representation = super().to_representation(instance)
-        return representation
-
     def create(self, validated_data):
         request = self.context.get('request')
         if not request:
@@ -0,0 +1,27 @@
+"""Invalidação dos caches e do índice de busca quando um produto ou imagem muda."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from wayne_backend.core.cache import bump_version
+from .models import CATALOG_CACHE, Product, ProductImage
+from .search import schedule_reindex
+from .stock import invalidate_stock_levels
+from .summaries import invalidate_product_summaries
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    # Índice antes do bump: quem ler a nova versão do catálogo já encontra o produto na busca
+    schedule_reindex([instance.pk])
+    invalidate_product_summaries([instance.pk])
+    invalidate_stock_levels([instance.pk])
+    bump_version(CATALOG_CACHE)
+
+
+# Também cobre o queryset.delete() usado na sincronização de imagens do ProductSerializer
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_changed(sender, instance, **kwargs):
+    invalidate_product_summaries([instance.product_id])
+    bump_version(CATALOG_CACHE)
@@ -0,0 +1,71 @@
+"""
+Estoque atual dos produtos em cache, uma chave por produto.
+
+As respostas do catálogo ficam em cache por versão (CATALOG_CACHE), mas a
+quantidade muda a cada checkout: em vez de invalidar o catálogo inteiro, a
+quantidade é sobreposta ao payload em cache a partir destas chaves, que são
+invalidadas só para os produtos reservados ou devolvidos.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+STOCK_TIMEOUT = 60 * 60
+
+
+def _stock_key(product_id):
+    return f"products:stock:{product_id}"
+
+
+def get_stock_levels(product_ids):
+    """Devolve {product_id: quantidade}; os que faltam no cache saem de uma query IN."""
+    product_ids = {int(product_id) for product_id in product_ids}
+    if not product_ids:
+        return {}
+
+    keys = {_stock_key(product_id): product_id for product_id in product_ids}
+    try:
+        cached = cache.get_many(list(keys))
+    except Exception as e:
+        logger.warning(f"⚠️ Cache unavailable while reading stock levels: {e}")
+        cached = {}
+    levels = {keys[key]: value for key, value in cached.items()}
+
+    missing = product_ids - levels.keys()
+    if missing:
+        fresh = dict(Product.objects.filter(id__in=missing).values_list('id', 'quantity'))
+        levels.update(fresh)
+        try:
+            cache.set_many({_stock_key(pid): quantity for pid, quantity in fresh.items()}, timeout=STOCK_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache unavailable while storing stock levels: {e}")
+
+    return levels
+
+
+def invalidate_stock_levels(product_ids):
+    """Remove as quantidades do cache depois do commit da transação atual."""
+    keys = [_stock_key(product_id) for product_id in product_ids]
+
+    def _delete():
+        try:
+            cache.delete_many(keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache unavailable while invalidating stock levels: {e}")
+
+    transaction.on_commit(_delete)
+
+
+def with_live_stock(data):
+    """Troca a quantity dos produtos serializados (lista, página ou detalhe) pela atual."""
+    rows = data.get('results', [data]) if isinstance(data, dict) else data
+    rows = [row for row in rows if isinstance(row, dict) and 'quantity' in row]
+    levels = get_stock_levels(row['id'] for row in rows)
+    for row in rows:
+        row['quantity'] = levels.get(row['id'], row['quantity'])
+    return data
@@ -0,0 +1,81 @@
+"""
+Resumo compacto de produtos (título, sku e imagem principal) para embutir em
+outras respostas, como os itens de pedido. Cada resumo fica no cache por
+produto; os que faltam são lidos com uma única query IN (+ uma para imagens).
+O cache guarda também o is_secret: produtos secretos só saem para quem pode vê-los.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .models import Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TIMEOUT = 60 * 60
+
+
+def _summary_key(product_id):
+    return f"products:summary:{product_id}"
+
+
+def _build_summary(product):
+    images = product.images.all()
+    return {
+        'id': product.id,
+        'title': product.title,
+        'sku': product.sku,
+        'image': images[0].url if images else None,
+        'is_secret': product.is_secret,
+    }
+
+
+def get_product_summaries(product_ids, include_secret=False):
+    """
+    Devolve {product_id: resumo}; ids inexistentes (e secretos, sem
+    include_secret) ficam de fora.
+    """
+    product_ids = {int(product_id) for product_id in product_ids}
+    if not product_ids:
+        return {}
+
+    keys = {_summary_key(product_id): product_id for product_id in product_ids}
+    try:
+        cached = cache.get_many(list(keys))
+    except Exception as e:
+        logger.warning(f"⚠️ Cache unavailable while reading product summaries: {e}")
+        cached = {}
+    summaries = {keys[key]: value for key, value in cached.items()}
+
+    missing = product_ids - summaries.keys()
+    if missing:
+        products = Product.objects.filter(id__in=missing).only('id', 'title', 'sku', 'is_secret').prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.only('id', 'product_id', 'url').order_by('id'))
+        )
+        fresh = {product.id: _build_summary(product) for product in products}
+        summaries.update(fresh)
+        try:
+            cache.set_many({_summary_key(pid): summary for pid, summary in fresh.items()}, timeout=SUMMARY_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache unavailable while storing product summaries: {e}")
+
+    return {
+        product_id: {key: value for key, value in summary.items() if key != 'is_secret'}
+        for product_id, summary in summaries.items()
+        if include_secret or not summary.get('is_secret', True)
+    }
+
+
+def invalidate_product_summaries(product_ids):
+    """Remove os resumos do cache depois do commit da transação atual."""
+    keys = [_summary_key(product_id) for product_id in product_ids]
+
+    def _delete():
+        try:
+            cache.delete_many(keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache unavailable while invalidating product summaries: {e}")
+
+    transaction.on_commit(_delete)
@@ -1,3 +1,188 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from orders.inventory import apply_stock_changes
+from permissions.models import PermissionGroup
+from .models import Product
+from .search import rebuild_product_search
+
+User = get_user_model()
+
+
+def create_product(title, price, category='Gadgets', **extra_fields):
+    return Product.objects.create(
+        title=title, description='-', category=category, quantity=extra_fields.pop('quantity', 10),
+        price_regular=price, price_sale=price, tax=Decimal('0.00'), **extra_fields
+    )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductCatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_product('Batarang', Decimal('20.00'), rating_rate=Decimal('4.5'))
+        create_product('Grapple Gun', Decimal('350.00'), rating_rate=Decimal('4.8'))
+        create_product('Cape', Decimal('900.00'), category='Armor', rating_rate=Decimal('3.9'))
+        create_product('Cowl', Decimal('700.00'), category='Armor', quantity=0)
+        create_product('Old Suit', Decimal('100.00'), category='Armor', is_active=False)
+        create_product('Kryptonite', Decimal('1.00'), is_secret=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def titles(self, **params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return [product['title'] for product in response.json()['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.titles(category='Armor', is_active=True), ['Cape', 'Cowl'])
+        self.assertEqual(self.titles(min_price='100', max_price='700'), ['Grapple Gun', 'Old Suit'])
+        self.assertEqual(self.titles(category='Armor', in_stock=True), ['Cape', 'Old Suit'])
+        self.assertEqual(self.titles(min_rating='4.5'), ['Batarang', 'Grapple Gun'])
+        self.assertEqual(self.titles(ordering='-price_sale', category='Gadgets'), ['Grapple Gun', 'Batarang'])
+
+    def test_facets_are_counted_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/products/facets/').json()
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(
+            [(c['slug'], c['name'], c['count']) for c in data['categories']],
+            [('armor', 'Armor', 3), ('gadgets', 'Gadgets', 2)],
+        )
+        self.assertEqual([b['count'] for b in data['price']], [1, 0, 1, 1, 2, 0])
+        self.assertEqual([b['count'] for b in data['rating']], [2, 3, 3, 3])
+
+        # Cada faixa de preço filtra exatamente os produtos que ela conta
+        for bucket in data['price']:
+            params = {'min_price': bucket['min'], **({'max_price': bucket['max']} if bucket['max'] else {})}
+            self.assertEqual(len(self.titles(**params)), bucket['count'], bucket)
+
+        data = self.client.get('/api/products/facets/', {'category': 'armor', 'is_active': True}).json()
+        self.assertEqual(data['categories'], [{'slug': 'armor', 'name': 'Armor', 'count': 2}])
+        self.assertEqual([b['count'] for b in data['rating']], [0, 1, 1, 1])
+
+    def test_cursor_pages_cost_the_same(self):
+        url, pages, queries = '/api/products/?page_size=2', [], set()
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                data = self.client.get(url).json()
+            queries.add(len(context))
+            pages.append([product['title'] for product in data['results']])
+            url = data['next']
+
+        self.assertEqual(pages, [['Batarang', 'Grapple Gun'], ['Cape', 'Cowl'], ['Old Suit']])
+        self.assertEqual(len(queries), 1)
+
+    def test_cursor_breaks_price_ties_by_id(self):
+        for title in ('Smoke Pellet', 'Rebreather', 'Tracker'):
+            create_product(title, Decimal('20.00'))
+
+        url, titles = '/api/products/?category=Gadgets&ordering=price_sale&page_size=2', []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                data = self.client.get(url).json()
+            sql = ' '.join(query['sql'] for query in context.captured_queries)
+            self.assertIn('ORDER BY "products"."price_sale" ASC, "products"."id" ASC', sql)
+            titles += [product['title'] for product in data['results']]
+            url = data['next']
+
+        self.assertEqual(titles, ['Batarang', 'Smoke Pellet', 'Rebreather', 'Tracker', 'Grapple Gun'])
+
+    def test_catalog_reads_are_cached_until_products_change(self):
+        product = Product.objects.get(title='Cape')
+        first = self.client.get('/api/products/', {'category': 'Armor'}).json()
+        detail = self.client.get(f'/api/products/{product.id}/').json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/products/', {'category': 'Armor'}).json(), first)
+            self.assertEqual(self.client.get(f'/api/products/{product.id}/').json(), detail)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.title = 'Batcape'
+            product.save()
+        self.assertEqual(self.client.get(f'/api/products/{product.id}/').json()['title'], 'Batcape')
+        self.assertIn('Batcape', self.titles(category='Armor'))
+
+    def test_stock_changes_refresh_quantity_without_dropping_the_catalog(self):
+        product = Product.objects.get(title='Batarang')
+        self.client.get('/api/products/', {'category': 'Gadgets'})
+        self.client.get('/api/products/', {'category': 'Gadgets'})  # estoque em cache
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_stock_changes({product.id: 4})
+        with self.assertNumQueries(1):  # só a quantidade do produto reservado
+            rows = self.client.get('/api/products/', {'category': 'Gadgets'}).json()['results']
+        self.assertEqual({row['title']: row['quantity'] for row in rows}, {'Batarang': 6, 'Grapple Gun': 10})
+
+        self.assertEqual(self.titles(category='Gadgets', in_stock=True), ['Batarang', 'Grapple Gun'])
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_stock_changes({product.id: 6})
+        self.assertEqual(self.titles(category='Gadgets', in_stock=True), ['Grapple Gun'])
+
+    def test_secret_products_are_filtered_in_the_queryset_only(self):
+        user = User.objects.create_user(
+            first_name='Lucius', last_name='Fox', email='lucius@wayne.com', birth_date=datetime.date(1950, 1, 1),
+            cpf='00000000001', phone='31999999999', password='batman', username='lucius',
+        )
+        self.client.force_authenticate(user)
+        self.assertNotIn('Kryptonite', self.titles())
+        self.assertNotIn(None, self.client.get('/api/products/').json()['results'])
+
+        user.groups.add(PermissionGroup.objects.create(name='Secret'))
+        for i in range(3):
+            create_product(f'Prototype {i}', Decimal('5.00'), category='Armor', is_secret=True)
+        with CaptureQueriesContext(connection) as few:
+            self.assertIn('Kryptonite', self.titles(category='Gadgets'))
+        with CaptureQueriesContext(connection) as many:
+            self.assertIn('Kryptonite', self.titles())
+        # Grupos e permissões carregados uma vez, independente do número de produtos
+        self.assertEqual(len(few), len(many))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_product('Utility Belt', Decimal('80.00'), category='Gadgets')
+        create_product('Batarang', Decimal('20.00'), category='Gadgets')
+        create_product('Batsuit', Decimal('900.00'), category='Armor')
+        create_product('Batmobile Prototype', Decimal('1.00'), is_secret=True)
+        create_product('Retired Batwing', Decimal('1.00'), is_active=False)
+        rebuild_product_search()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, **params):
+        response = self.client.get('/api/products/search/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['title'] for row in response.json()]
+
+    def test_ranked_search_and_autocomplete_respect_visibility(self):
+        self.assertEqual(self.search(q='batarang'), ['Batarang'])
+        self.assertEqual(self.search(q='bat'), [])
+        self.assertEqual(sorted(self.search(q='bat', mode='autocomplete')), ['Batarang', 'Batsuit'])
+        self.assertEqual(self.search(q='armor'), ['Batsuit'])
+        self.assertEqual(self.search(q=Product.objects.get(title='Batarang').sku), ['Batarang'])
+        self.assertEqual(self.client.get('/api/products/search/').status_code, 400)
+
+    def test_index_follows_product_changes(self):
+        product = Product.objects.get(title='Utility Belt')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.title = 'Grapnel Belt'
+            product.save()
+        self.assertEqual(self.search(q='grapnel'), ['Grapnel Belt'])
+        self.assertEqual(self.search(q='utility'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.search(q='belt'), [])
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet
+from .views import ProductViewSet, ProductExportView
 
 router = DefaultRouter()
 router.register(r'', ProductViewSet, basename='products')
 
 urlpatterns = [
+    path('export/', ProductExportView.as_view(), name='products-export'),
     path('', include(router.urls)),
 ]
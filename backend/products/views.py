@@ -1,15 +1,41 @@
+import functools
 import os
 import logging
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.generics import RetrieveAPIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Q
-from .models import Product
+from permissions.principal import get_principal
+from wayne_backend.core.cache import cache_response
+from wayne_backend.core.exports import StreamingExportView
+from .facets import facet_counts
+from .filters import ProductFilter
+from .models import CATALOG_CACHE, Product
+from .pagination import ProductCursorPagination
+from .search import search_product_ids
 from .serializers import ProductSerializer
+from .stock import with_live_stock
 
 logger = logging.getLogger(__name__)
 
+
+def catalog_audience(view, request):
+    """Quem tem o grupo Secret vê outro catálogo: chave de cache separada."""
+    return 'secret' if get_principal(request).can_view_secret else 'public'
+
+
+def live_stock(view_method):
+    """A quantity não entra na versão do catálogo: vem das chaves de estoque (stock.py)."""
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        response = view_method(view, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            with_live_stock(response.data)
+        return response
+    return wrapper
+
+
 class ProductViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing products.
@@ -17,7 +43,11 @@ class ProductViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ProductSerializer
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
-    
+    pagination_class = ProductCursorPagination
+    filterset_class = ProductFilter
+    ordering_fields = ['id', 'price_sale', 'rating_rate']
+    ordering = ['id']
+
     def get_permissions(self):
         if self.request.method in ['GET']:
             return [AllowAny()]
@@ -29,18 +59,65 @@ class ProductViewSet(viewsets.ModelViewSet):
         - If user is not authenticated or doesn't have Secret group, exclude secret products
         - If user has Secret group, show all products
         """
-        queryset = Product.objects.all().order_by('id')
-        
-        # Check if user has Secret group permission
-        user = self.request.user
-        has_secret_permission = user.is_authenticated and user.groups.filter(name='Secret').exists()
-        
-        # If user doesn't have Secret permission, exclude secret products
-        if not has_secret_permission:
-            queryset = queryset.filter(Q(is_secret=False))
-            
+        queryset = Product.objects.prefetch_related('images').order_by('id')
+
+        # Grupos do usuário vêm do principal da requisição (carregado uma vez)
+        if not get_principal(self.request).can_view_secret:
+            queryset = queryset.filter(is_secret=False)
+
         return queryset
 
+    @live_stock
+    @cache_response(CATALOG_CACHE, timeout=60 * 60, vary=catalog_audience)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @live_stock
+    @cache_response(CATALOG_CACHE, timeout=60 * 60, vary=catalog_audience)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], url_path='facets')
+    @cache_response(CATALOG_CACHE, timeout=60 * 60, vary=catalog_audience)
+    def facets(self, request):
+        """
+        Contagens por categoria, faixa de preço e avaliação para os mesmos
+        filtros da listagem: GET products/facets/?category=...&min_price=...
+        """
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        return Response(facet_counts(queryset))
+
+    @action(detail=False, methods=['get'], url_path='search')
+    @live_stock
+    @cache_response(CATALOG_CACHE, timeout=60 * 60, vary=catalog_audience)
+    def search(self, request):
+        """
+        Busca ranqueada por título, descrição, categoria, SKU e código:
+        GET products/search/?q=...&limit=...
+        Com ?mode=autocomplete casa o início dos termos e devolve só
+        id, título, categoria e SKU (até 10 sugestões).
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        autocomplete = request.query_params.get('mode', 'search') == 'autocomplete'
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10 if autocomplete else 20)), 1), 10 if autocomplete else 100)
+        except ValueError:
+            return Response({"error": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = search_product_ids(
+            text, include_secret=get_principal(request).can_view_secret, limit=limit, prefix=autocomplete
+        )
+        if autocomplete:
+            rows = {row['id']: row for row in Product.objects.filter(id__in=ids).values('id', 'title', 'category', 'sku')}
+            return Response([rows[i] for i in ids if i in rows])
+
+        products = Product.objects.prefetch_related('images').in_bulk(ids)
+        serializer = self.get_serializer([products[i] for i in ids if i in products], many=True)
+        return Response(serializer.data)
+
     def get_serializer_context(self):
         """Pass the request to the serializer context."""
         context = super().get_serializer_context()
@@ -94,14 +171,28 @@ class ProductDetailView(RetrieveAPIView):
         - If user doesn't have Secret group, exclude secret products
         - If user has Secret group, show all products
         """
-        queryset = Product.objects.all()
-        
-        # Check if user has Secret group permission
-        user = self.request.user
-        has_secret_permission = user.is_authenticated and user.groups.filter(name='Secret').exists()
-        
-        # If user doesn't have Secret permission, exclude secret products
-        if not has_secret_permission:
-            queryset = queryset.filter(Q(is_secret=False))
-            
+        queryset = Product.objects.prefetch_related('images')
+
+        if not get_principal(self.request).can_view_secret:
+            queryset = queryset.filter(is_secret=False)
+
         return queryset
+
+
+class ProductExportView(StreamingExportView):
+    """
+    Exporta os produtos (CSV ou NDJSON, em streaming).
+    Produtos secretos só saem para quem tem o grupo Secret.
+    """
+    export_menu = 'products'
+    filename = 'products'
+    columns = [
+        'id', 'code', 'sku', 'title', 'category', 'quantity', 'price_regular', 'price_sale', 'tax',
+        'rating_rate', 'rating_count', 'is_active', 'is_secret', 'inserted_in', 'modified_in',
+    ]
+
+    def get_queryset(self):
+        queryset = Product.objects.order_by('id')
+        if not get_principal(self.request).can_view_secret:
+            queryset = queryset.filter(is_secret=False)
+        return queryset.values(*self.columns)
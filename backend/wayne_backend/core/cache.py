@@ -0,0 +1,95 @@
+import functools
+import logging
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+def _version_key(namespace):
+    return f"{namespace}:version"
+
+
+def get_version(namespace):
+    """
+    Versão atual de um namespace de cache (criada se ainda não existir),
+    ou None quando o backend de cache está indisponível.
+    """
+    key = _version_key(namespace)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, 1, timeout=None)
+            version = cache.get(key, 1)
+        return version
+    except Exception as e:
+        logger.warning(f"⚠️ Cache indisponível ao ler a versão de '{namespace}': {e}")
+        return None
+
+
+def bump_version(namespace):
+    """
+    Invalida todas as chaves do namespace incrementando a versão.
+    O incremento roda depois do commit da transação atual, para que nenhuma
+    leitura guarde dados anteriores à escrita sob a versão nova.
+    """
+    def _bump():
+        key = _version_key(namespace)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, 1, timeout=None)
+                cache.incr(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache indisponível ao incrementar a versão de '{namespace}': {e}")
+
+    transaction.on_commit(_bump)
+
+
+def versioned_key(namespace, version, *parts):
+    return ":".join([namespace, f"v{version}", *[str(part) for part in parts]])
+
+
+def cache_response(namespace, timeout=60 * 15, vary=None):
+    """
+    Decorator para APIView.get (ou list/retrieve de um ViewSet): guarda os dados
+    das respostas 200 por view, kwargs da URL e query string, na versão atual de
+    `namespace`. `vary(view, request)` acrescenta uma parte à chave quando a
+    resposta muda por público ou por data.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            version = get_version(namespace)
+            if version is None:
+                return view_method(view, request, *args, **kwargs)
+
+            query = urlencode(sorted(request.query_params.items()))
+            parts = [type(view).__name__, view_method.__name__]
+            parts += [f"{k}={v}" for k, v in sorted(kwargs.items())]
+            if vary is not None:
+                parts.append(vary(view, request))
+            key = versioned_key(namespace, version, *parts, query)
+
+            try:
+                data = cache.get(key)
+            except Exception:
+                data = None
+            if data is not None:
+                return Response(data, status=status.HTTP_200_OK)
+
+            response = view_method(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                try:
+                    cache.set(key, response.data, timeout=timeout)
+                except Exception as e:
+                    logger.warning(f"⚠️ Não foi possível guardar a resposta em cache ({key}): {e}")
+            return response
+
+        return wrapper
+    return decorator
@@ -0,0 +1,101 @@
+"""
+Exportação em streaming (CSV e NDJSON).
+
+As linhas são lidas com .iterator(chunk_size=...) e escritas uma a uma em um
+StreamingHttpResponse: a memória fica constante independentemente do número
+de linhas e os primeiros bytes saem assim que o primeiro chunk é lido.
+"""
+import csv
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from permissions.checks import CanExport
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """Buffer falso para o csv.writer: devolve a linha em vez de guardá-la."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_cell(row.get(column)) for column in columns])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class StreamingExportView(APIView):
+    """
+    Base das views de exportação. Subclasses definem `export_menu` (menu do
+    can_export), `filename`, `columns` e `queryset` (ou `get_queryset()`,
+    quando depende da requisição); `to_row(obj)` só precisa ser sobrescrito
+    quando o queryset não é um .values().
+    Formato via ?file_format=csv|ndjson (csv por padrão).
+    """
+    permission_classes = [CanExport]
+    export_menu = None
+    filename = 'export'
+    columns = []
+    queryset = None
+    chunk_size = DEFAULT_CHUNK_SIZE
+
+    def get_queryset(self):
+        # Como no GenericAPIView: .all() para não reaproveitar o cache do queryset da classe
+        if self.queryset is None:
+            raise ImproperlyConfigured(
+                f"{self.__class__.__name__} should either include a `queryset` attribute, "
+                f"or override the `get_queryset()` method."
+            )
+        return self.queryset.all()
+
+    def to_row(self, obj):
+        return obj
+
+    def iter_rows(self):
+        for obj in self.get_queryset().iterator(chunk_size=self.chunk_size):
+            yield self.to_row(obj)
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Invalid file_format. Use one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if file_format == 'csv':
+            content = stream_csv(self.columns, self.iter_rows())
+        else:
+            content = stream_ndjson(self.iter_rows())
+
+        response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[file_format])
+        stamp = now().strftime('%Y%m%d%H%M%S')
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}-{stamp}.{file_format}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
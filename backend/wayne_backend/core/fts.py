@@ -0,0 +1,93 @@
+"""
+Helpers para índices de busca full-text com SQLite FTS5.
+
+Os índices são tabelas virtuais fora do ORM (criadas no post_migrate e
+reconstruídas por comando), com rowid igual ao id da linha indexada.
+Em outros bancos as funções não fazem nada e `fts_available()` é False,
+para que as views possam cair em um filtro comum.
+"""
+import re
+
+from django.db import connection
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def create_fts_table(table, columns, prefix='2 3'):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{table}" USING fts5('
+            f'{", ".join(columns)}, prefix=\'{prefix}\', tokenize=\'unicode61 remove_diacritics 2\')'
+        )
+
+
+def drop_fts_table(table):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS "{table}"')
+
+
+def fts_match_expression(text, prefix=True):
+    """
+    Converte o texto digitado em uma expressão MATCH segura: cada termo vira
+    uma string entre aspas (sem operadores do FTS5), com * para busca por prefixo.
+    Devolve '' se não sobrar nenhum termo.
+    """
+    terms = TOKEN_RE.findall(text or '')
+    suffix = '*' if prefix else ''
+    return ' '.join(f'"{term}"{suffix}' for term in terms)
+
+
+def replace_rows(table, columns, rows):
+    """Remove e reinsere as linhas (rowid, *valores) do índice."""
+    if not fts_available() or not rows:
+        return
+    with connection.cursor() as cursor:
+        delete_rows(table, [row[0] for row in rows], cursor=cursor)
+        placeholders = ', '.join(['%s'] * (len(columns) + 1))
+        cursor.executemany(
+            f'INSERT INTO "{table}" (rowid, {", ".join(columns)}) VALUES ({placeholders})',
+            rows,
+        )
+
+
+def delete_rows(table, rowids, cursor=None):
+    if not fts_available() or not rowids:
+        return
+    rowids = list(rowids)
+    if cursor is None:
+        with connection.cursor() as cursor:
+            return delete_rows(table, rowids, cursor=cursor)
+    for start in range(0, len(rowids), 500):
+        chunk = rowids[start:start + 500]
+        cursor.execute(
+            f'DELETE FROM "{table}" WHERE rowid IN ({", ".join(["%s"] * len(chunk))})',
+            chunk,
+        )
+
+
+def fts_search(table, text, weights, limit=50, prefix=True, join='', where='', params=()):
+    """
+    Busca ranqueada por bm25 (menor = mais relevante).
+    `weights` segue a ordem das colunas da tabela. Devolve [(rowid, rank)].
+    `join`/`where` (com `params`) filtram pela tabela de origem antes do
+    LIMIT, para que linhas invisíveis não consumam as vagas do resultado.
+    """
+    expression = fts_match_expression(text, prefix=prefix)
+    if not fts_available() or not expression:
+        return []
+    condition = f' AND {where}' if where else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT "{table}".rowid, bm25("{table}", {", ".join(str(w) for w in weights)}) AS score '
+            f'FROM "{table}" {join} WHERE "{table}" MATCH %s{condition} ORDER BY score LIMIT %s',
+            [expression, *params, limit],
+        )
+        return cursor.fetchall()
@@ -0,0 +1,152 @@
+"""
+Séries temporais com buckets no fuso do usuário e preenchimento de lacunas no SQL.
+
+Os limites dos buckets são calculados em Python com zoneinfo (meia-noite local,
+semanas começando na segunda, meses de calendário), então horário de verão e
+fusos com meia hora ficam corretos. O banco recebe esses limites como uma CTE
+VALUES e faz um LEFT JOIN com as linhas filtradas por intervalo (que usa o
+índice da coluna de data): buckets vazios saem com zero.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import connection
+from django.utils.timezone import get_current_timezone, localtime
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+MAX_BUCKETS = 1000
+
+
+class TimeSeriesError(ValueError):
+    """Parâmetros inválidos para a série (fuso, granularidade ou intervalo)."""
+
+
+def resolve_timezone(name=None):
+    if not name:
+        return get_current_timezone()
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise TimeSeriesError(f"Unknown timezone: {name}.")
+
+
+def _local_midnight(day, tz):
+    return datetime.combine(day, time.min, tzinfo=tz)
+
+
+def _next_month(day):
+    return day.replace(year=day.year + day.month // 12, month=day.month % 12 + 1, day=1)
+
+
+def floor_to_bucket(value, granularity, tz):
+    """Início do bucket (no fuso `tz`) que contém o instante `value`."""
+    local = localtime(value, tz)
+    if granularity == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    day = local.date()
+    if granularity == 'week':
+        day -= timedelta(days=day.weekday())
+    elif granularity == 'month':
+        day = day.replace(day=1)
+    return _local_midnight(day, tz)
+
+
+def next_bucket(start, granularity, tz):
+    if granularity == 'hour':
+        # Horas em tempo absoluto: a hora repetida do fim do horário de verão vira dois buckets
+        return localtime(start.astimezone(dt_timezone.utc) + timedelta(hours=1), tz)
+    day = start.date()
+    if granularity == 'day':
+        return _local_midnight(day + timedelta(days=1), tz)
+    if granularity == 'week':
+        return _local_midnight(day + timedelta(days=7), tz)
+    return _local_midnight(_next_month(day), tz)
+
+
+def bucket_label(start, granularity):
+    if granularity == 'hour':
+        return start.strftime('%Y-%m-%d %H:00')
+    if granularity == 'day':
+        return start.strftime('%Y-%m-%d')
+    if granularity == 'week':
+        year, week, _ = start.isocalendar()
+        return f'{year}-W{week:02d}'
+    return start.strftime('%Y-%m')
+
+
+def bucket_boundaries(start, end, granularity, tz):
+    """
+    Lista de (início, fim) dos buckets que cobrem [start, end), com o primeiro
+    bucket alinhado ao início do período que contém `start`.
+    """
+    if granularity not in GRANULARITIES:
+        raise TimeSeriesError(f"Invalid granularity. Use one of: {', '.join(GRANULARITIES)}.")
+    if start >= end:
+        raise TimeSeriesError("start must be before end.")
+
+    buckets = []
+    current = floor_to_bucket(start, granularity, tz)
+    while current < end:
+        following = next_bucket(current, granularity, tz)
+        buckets.append((current, following))
+        if len(buckets) > MAX_BUCKETS:
+            raise TimeSeriesError(f"Too many buckets (max {MAX_BUCKETS}); use a coarser granularity.")
+        current = following
+    return buckets
+
+
+def period_range(period, tz=None):
+    """
+    Intervalo [início, fim) do mês ou ano atual no fuso local, para filtrar
+    com created_at__gte/__lt (usa índice) em vez de __year/__month.
+    Devolve None para qualquer outro período.
+    """
+    tz = tz or get_current_timezone()
+    today = localtime(timezone=tz).date()
+    if period == 'month':
+        first = today.replace(day=1)
+        return _local_midnight(first, tz), _local_midnight(_next_month(first), tz)
+    if period == 'year':
+        return _local_midnight(today.replace(month=1, day=1), tz), _local_midnight(today.replace(year=today.year + 1, month=1, day=1), tz)
+    return None
+
+
+def gap_filled_series(queryset, time_field, buckets, value=None, aggregate='COUNT'):
+    """
+    Agrega `queryset` por bucket com um único SELECT:
+
+        WITH buckets(idx, starts, ends) AS (VALUES ...), facts AS (<queryset>)
+        SELECT idx, AGG(value) FROM buckets LEFT JOIN facts ... GROUP BY idx
+
+    `value` é o nome de uma coluna/anotação do queryset (None conta linhas) e
+    `aggregate` é COUNT ou SUM. Devolve um valor por bucket, na ordem.
+    """
+    if aggregate not in ('COUNT', 'SUM'):
+        raise TimeSeriesError("aggregate must be COUNT or SUM.")
+    if not buckets:
+        return []
+
+    fields = [time_field] + ([value] if value else [])
+    rows = queryset.filter(
+        **{f'{time_field}__gte': buckets[0][0], f'{time_field}__lt': buckets[-1][1]}
+    ).values_list(*fields)
+    sql, params = rows.query.sql_with_params()
+
+    qn = connection.ops.quote_name
+    adapt = connection.ops.adapt_datetimefield_value
+    values_sql = ', '.join(['(%s, %s, %s)'] * len(buckets))
+    values_params = [param for idx, (start, end) in enumerate(buckets) for param in (idx, adapt(start), adapt(end))]
+
+    # Colunas dos fatos por posição: c0 = tempo, c1 = valor
+    columns = ', '.join(qn(f'c{i}') for i in range(len(fields)))
+    measure = f'{aggregate}(f.{qn("c1")})' if value else f'COUNT(f.{qn("c0")})'
+    query = (
+        f'WITH buckets (idx, starts, ends) AS (VALUES {values_sql}), '
+        f'facts ({columns}) AS ({sql}) '
+        f'SELECT b.idx, COALESCE({measure}, 0) '
+        f'FROM buckets b LEFT JOIN facts f ON f.{qn("c0")} >= b.starts AND f.{qn("c0")} < b.ends '
+        f'GROUP BY b.idx ORDER BY b.idx'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(query, [*values_params, *params])
+        return [row[1] for row in cursor.fetchall()]
@@ -22,6 +22,8 @@ SECRET_KEY = config("SECRET_KEY", default=get_random_secret_key())
 FIELD_ENCRYPTION_KEY = config("FIELD_ENCRYPTION_KEY", get_random_secret_key())
 
 AFTERSHIP_API_KEY = config("AFTERSHIP_API_KEY")
+AFTERSHIP_API_URL = config("AFTERSHIP_API_URL", default="https://api.aftership.com/v4/trackings")
+AFTERSHIP_TIMEOUT = config("AFTERSHIP_TIMEOUT", default=10, cast=int)
 
 # Definir o modo DEBUG baseado no ambiente
 DEBUG = config("DEBUG", default=False, cast=bool)
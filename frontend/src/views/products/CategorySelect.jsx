@@ -2,22 +2,24 @@ import React, { useEffect, useState, forwardRef } from 'react';
 import { FormControl, InputLabel, Select, MenuItem } from '@mui/material';
 import axios from 'axios';
 import { API_ROUTES } from '../../routes/ApiRoutes';
+import useLocalStorage from '../../hooks/useLocalStorage';
 
 const CategorySelect = forwardRef(function CategorySelect({ value, onChange, name = 'category', label = 'Category', ...props }, ref) {
   const [categories, setCategories] = useState([]);
+  const [userData] = useLocalStorage('wayne-user-data', {});
+
+  const token = userData?.authToken || null;
 
   useEffect(() => {
     const fetchCategories = async () => {
       try {
-        const response = await axios.get(API_ROUTES.PRODUCTS, {
-          headers: {
-            Authorization: `Bearer ${token}`
-          }
+        // Facetas: uma linha por categoria, sem baixar o catálogo
+        const response = await axios.get(`${API_ROUTES.PRODUCTS}facets/`, {
+          headers: token ? { Authorization: `Bearer ${token}` } : {}
         });
-        const products = Array.isArray(response.data.results) ? response.data.results : response.data;
+        const names = (response.data?.categories || []).map((c) => c.name);
 
-        const unique = [...new Set(products.map((p) => p.category))].sort();
-        setCategories(unique);
+        setCategories(names.sort());
       } catch (error) {
         console.error('Failed to fetch categories:', error);
       }
@@ -11,6 +11,9 @@ import useLocalStorage from '../../hooks/useLocalStorage';
 import sxColumns from '../../ui-component/dataGrid/styles/sxColumns';
 import createProductColumns from '../../ui-component/dataGrid/columns/productColumns';
 import { useTheme } from '@mui/material/styles';
+import { Box, Button } from '@mui/material';
+
+const PAGE_SIZE = 50;
 
 const ListPage = () => {
   const theme = useTheme();
@@ -19,41 +22,55 @@ const ListPage = () => {
   const [selectionModel, setSelectionModel] = useState([]);
   const [filterModel, setFilterModel] = useState({ items: [] });
   const [loading, setLoading] = useState(true);
+  const [nextUrl, setNextUrl] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [userData] = useLocalStorage('wayne-user-data', {});
 
   const hasFilters = filterModel.items.length > 0;
 
   const token = userData?.authToken || null;
 
-  useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const response = await axios.get(API_ROUTES.PRODUCTS, {
-          headers: {
-            Authorization: `Bearer ${token}`
-          }
-        });
-        const productList = response.data?.results || response.data || [];
-
-        if (!Array.isArray(productList)) {
-          console.error('❌ API response is not a list:', response.data);
-          return;
+  // A API pagina por cursor: carrega uma página e busca a próxima só no "Load more"
+  const fetchPage = useCallback(
+    async (url) => {
+      const response = await axios.get(url, {
+        headers: {
+          Authorization: `Bearer ${token}`
         }
+      });
 
-        setProducts(productList);
-        setFilteredProducts(productList);
-        setLoading(false);
-
-        if (isDebug) console.log('📦 Produtos carregados:', productList);
-      } catch (error) {
-        console.error('❌ Erro ao carregar produtos:', error);
-        setLoading(false);
+      const page = response.data?.results;
+      if (!Array.isArray(page)) {
+        console.error('❌ API response is not a page:', response.data);
+        return;
       }
-    };
 
-    fetchData();
+      setProducts((prev) => [...prev, ...page]);
+      setFilteredProducts((prev) => [...prev, ...page]);
+      setNextUrl(response.data.next);
+
+      if (isDebug) console.log('📦 Produtos carregados:', page);
+    },
+    [token]
+  );
+
+  useEffect(() => {
+    fetchPage(`${API_ROUTES.PRODUCTS}?page_size=${PAGE_SIZE}`)
+      .catch((error) => console.error('❌ Erro ao carregar produtos:', error))
+      .finally(() => setLoading(false));
   }, []);
 
+  const onLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      await fetchPage(nextUrl);
+    } catch (error) {
+      console.error('❌ Erro ao carregar mais produtos:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const onDeleteSelected = async () => {
     try {
       await Promise.all(
@@ -130,17 +147,27 @@ const ListPage = () => {
   const columns = createProductColumns(handleDelete);
 
   return (
-    <DynamicDataGrid
-      data={filteredProducts || []}
-      columns={columns}
-      loading={loading}
-      selectionModel={selectionModel}
-      setSelectionModel={setSelectionModel}
-      filterModel={filterModel}
-      setFilterModel={setFilterModel}
-      slots={slots}
-      sx={sxColumns(theme)}
-    />
+    <>
+      <DynamicDataGrid
+        data={filteredProducts || []}
+        columns={columns}
+        loading={loading}
+        selectionModel={selectionModel}
+        setSelectionModel={setSelectionModel}
+        filterModel={filterModel}
+        setFilterModel={setFilterModel}
+        slots={slots}
+        sx={sxColumns(theme)}
+      />
+
+      {!loading && nextUrl && (
+        <Box display="flex" justifyContent="center" mt={2}>
+          <Button variant="outlined" onClick={onLoadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </Button>
+        </Box>
+      )}
+    </>
   );
 };
 